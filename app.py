@@ -1,10 +1,16 @@
 """Telemetry Server API."""
+import asyncio
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
+from pymongo.errors import OperationFailure
+
+from helpers.indexes import ensure_indexes
+from inference import configure_runtime, configure_threads, get_model
 from routers import (
+    health_router,
     store_router,
     user_router
 )
@@ -25,4 +31,43 @@ app.add_middleware(
 
 app.include_router(user_router.router)
 app.include_router(store_router.router)
+app.include_router(health_router.router)
 app.mount("/zpg/assets", StaticFiles(directory="assets"), name="assets")
+
+if user_router.config.inference.preload:
+    # With gunicorn preload_app this runs in the master before fork, so
+    # workers share the model pages instead of loading their own copy.
+    # Thread pools are sized before the first torch operation; cpu
+    # pinning is left to configure_runtime in each worker's startup.
+    configure_threads(user_router.config.inference)
+    get_model(user_router.config.inference)
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    """Connect, create indexes, tune torch, warm up and start tip pool."""
+    store_router.server.connect()
+    server = user_router.server
+    server.connect()
+    try:
+        await ensure_indexes(server.db)
+    except OperationFailure:
+        # Duplicates left by old store syncs fail unique indexes until
+        # the next store update removes them.
+        server.log.exception("Could not create indexes")
+    configure_runtime(server.config.inference)
+    if not server.ready:
+        asyncio.ensure_future(server.warmup())
+    server.pool.start()
+    if server.writes is not None:
+        server.writes.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Write buffered user updates and wait for inference jobs before exit."""
+    server = user_router.server
+    if server.writes is not None:
+        await server.writes.stop()
+    server.pool.stop()
+    server.executor.shutdown()
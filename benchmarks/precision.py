@@ -0,0 +1,88 @@
+"""Compare inference precision modes.
+
+Each mode is measured in a fresh process so that peak RSS is not
+polluted by the previous model::
+
+    python -m benchmarks.precision --modes fp32 int8 bf16 --runs 5
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from typing import Dict, List
+
+from inference import InferenceConfig, generate_texts
+from inference.precision import PRECISIONS
+from inference.registry import _load_model
+
+PROMPTS = [
+    "Здравствуй!",
+    "Надо бы доказать теорему.",
+    "Хочу селекционировать новый вид хищных растений.",
+    "Сейчас бы решить какую-нибудь задачку!",
+]
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in megabytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_mode(model_name: str, precision: str, runs: int) -> Dict:
+    """Load the model in one precision and measure generation."""
+    config = InferenceConfig(model_name=model_name, precision=precision)
+    started = time.perf_counter()
+    model, tokenizer = _load_model(config)
+    load_seconds = time.perf_counter() - started
+
+    tokens = 0
+    seconds = 0.0
+    samples: List[str] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        texts = generate_texts(model, tokenizer, PROMPTS)
+        seconds += time.perf_counter() - started
+        for prompt, text in zip(PROMPTS, texts):
+            tokens += (
+                len(tokenizer.encode(text))
+                - len(tokenizer.encode(prompt))
+            )
+        samples = texts
+    return {
+        "precision": precision,
+        "load_seconds": round(load_seconds, 3),
+        "tokens_per_second": round(tokens / seconds, 2) if seconds else 0,
+        "seconds_per_batch": round(seconds / runs, 3) if runs else 0,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "samples": samples,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--model-name",
+        default=InferenceConfig().model_name
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=PRECISIONS,
+        default=list(PRECISIONS)
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for mode in args.modes:
+        with context.Pool(1) as pool:
+            results.append(
+                pool.apply(bench_mode, (args.model_name, mode, args.runs))
+            )
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
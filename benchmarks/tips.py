@@ -0,0 +1,240 @@
+"""Offline benchmark of the tip pipeline.
+
+Runs tip_gen end to end (batching scheduler, executor, prompt cache,
+constrained decoding, retries) against a tiny randomly initialised
+GPT-2 that needs no network, or against the real model when it is
+already in the local HF cache, and prints JSON that can be diffed
+between commits::
+
+    python -m benchmarks.tips --batch-sizes 1 4 8 --threads 1 2
+    python -m benchmarks.tips --real --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import torch
+from transformers import (
+    GPT2Config,
+    GPT2LMHeadModel,
+    GPT2Tokenizer
+)
+from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+from helpers.metrics import get_counters
+from helpers.tip_gen import tip_gen
+from inference import (
+    BatchScheduler,
+    InferenceConfig,
+    InferenceExecutor,
+    PromptCache,
+    generate_texts
+)
+from inference.generate import GENERATE_KWARGS
+from inference.registry import _load_model
+from models.users import User
+
+EOS_TOKEN = "<|endoftext|>"
+
+
+def tiny_model(path: Path) -> Tuple[GPT2LMHeadModel, GPT2Tokenizer]:
+    """Build a random 2-layer GPT-2 with a letter-level vocabulary.
+
+    The vocabulary holds every byte plus one token per Cyrillic letter,
+    so the Russian prompts encode to about one token per character.
+    """
+    byte_encoder = bytes_to_unicode()
+    vocab = {
+        char: index
+        for index, char in enumerate(byte_encoder.values())
+    }
+    merges = ["#version: 0.2"]
+    for code in range(0x0400, 0x0500):
+        first, second = (byte_encoder[byte] for byte in chr(code).encode())
+        merges.append(f"{first} {second}")
+        vocab[first + second] = len(vocab)
+    vocab[EOS_TOKEN] = len(vocab)
+    (path / "vocab.json").write_text(json.dumps(vocab))
+    (path / "merges.txt").write_text("\n".join(merges) + "\n")
+    tokenizer = GPT2Tokenizer(
+        str(path / "vocab.json"),
+        str(path / "merges.txt")
+    )
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+
+    torch.manual_seed(0)
+    config = GPT2Config(
+        vocab_size=len(vocab),
+        n_positions=256,
+        n_embd=64,
+        n_layer=2,
+        n_head=2,
+        bos_token_id=vocab[EOS_TOKEN],
+        eos_token_id=vocab[EOS_TOKEN],
+    )
+    model = GPT2LMHeadModel(config)
+    model.eval()
+    return model, tokenizer
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = round(percent / 100 * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
+
+
+def _counter_delta(before: Dict[str, int], name: str) -> int:
+    return get_counters().get(name, 0) - before.get(name, 0)
+
+
+async def run_config(
+    model: GPT2LMHeadModel,
+    tokenizer: GPT2Tokenizer,
+    batch_size: int,
+    rounds: int,
+) -> Dict:
+    """Run rounds of batch_size concurrent tips and collect stats."""
+    executor = InferenceExecutor(slots=1, max_queue_depth=rounds * batch_size)
+    prompt_cache = PromptCache()
+    generated_tokens = 0
+
+    def generate(queries: List[str]) -> List[str]:
+        nonlocal generated_tokens
+        texts = generate_texts(model, tokenizer, queries, prompt_cache)
+        for query, text in zip(queries, texts):
+            generated_tokens += (
+                len(tokenizer.encode(text))
+                - len(tokenizer.encode(query))
+            )
+        return texts
+
+    async def generate_async(queries: List[str]) -> List[str]:
+        return await executor.run(generate, queries)
+
+    scheduler = BatchScheduler(
+        generate=generate_async,
+        max_batch_size=batch_size,
+        batch_window=0.005,
+    )
+    user = User.create_new(username="bench")
+    user.next_item = "Колба"
+
+    async def one_tip() -> float:
+        started = time.perf_counter()
+        await tip_gen(None, user, 1.0, scheduler)  # type: ignore
+        return time.perf_counter() - started
+
+    before = get_counters()
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        latencies.extend(
+            await asyncio.gather(*[one_tip() for _ in range(batch_size)])
+        )
+    seconds = time.perf_counter() - started
+    executor.shutdown()
+
+    tips = len(latencies)
+    retries = _counter_delta(before, "tip_retry")
+    return {
+        "batch_size": batch_size,
+        "threads": torch.get_num_threads(),
+        "tips": tips,
+        "latency_ms": {
+            name: round(percentile(latencies, percent) * 1000, 2)
+            for name, percent in (("p50", 50), ("p95", 95), ("p99", 99))
+        },
+        "tips_per_second": round(tips / seconds, 2),
+        "tokens_per_second": round(generated_tokens / seconds, 2),
+        "retries_per_tip": round(retries / tips, 3),
+        "fallbacks": _counter_delta(before, "tip_fallback"),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            1
+        ),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--real",
+        action="store_true",
+        help="use the real model from the local HF cache"
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        nargs="+",
+        type=int,
+        default=[1, 4, 8]
+    )
+    parser.add_argument("--threads", nargs="+", type=int, default=[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--max-length",
+        type=int,
+        help="override max tokens per tip, prompt included; the tiny "
+             "tokenizer splits words into letters and defaults to 120"
+    )
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.real:
+            os.environ["TRANSFORMERS_OFFLINE"] = "1"
+            model, tokenizer = _load_model(InferenceConfig())
+            model_name = InferenceConfig().model_name
+        else:
+            model, tokenizer = tiny_model(Path(tmp))
+            model_name = "tiny-random-gpt2"
+        if args.max_length:
+            GENERATE_KWARGS["max_length"] = args.max_length
+        elif not args.real:
+            GENERATE_KWARGS["max_length"] = 120
+
+        results = []
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            for batch_size in args.batch_sizes:
+                results.append(asyncio.run(
+                    run_config(model, tokenizer, batch_size, args.rounds)
+                ))
+
+    report = {
+        "commit": _git_commit(),
+        "model": model_name,
+        "torch": torch.__version__,
+        "rounds": args.rounds,
+        "max_length": GENERATE_KWARGS["max_length"],
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from pathlib import Path
 
 from pydantic import BaseSettings, Field
 
+from inference import InferenceConfig
 from mongo import MongoDBConfig
 
 
@@ -26,6 +27,38 @@ class MongoDBParams(MongoDBConfig, EnvSettings):
     db: str = Field(..., env="MONGO_DB")
 
 
+class InferenceParams(InferenceConfig, EnvSettings):
+    """Config for text generation model."""
+
+    model_name: str = Field(
+        "sberbank-ai/rugpt3medium_based_on_gpt2",
+        env="GIMMEFY_MODEL_NAME"
+    )
+    precision: str = Field("fp32", env="GIMMEFY_INFERENCE_PRECISION")
+    weights_path: str = Field("", env="GIMMEFY_WEIGHTS_PATH")
+    preload: bool = Field(False, env="GIMMEFY_INFERENCE_PRELOAD")
+
+    torch_threads: int = Field(0, env="GIMMEFY_TORCH_THREADS")
+    torch_interop_threads: int = Field(0, env="GIMMEFY_TORCH_INTEROP_THREADS")
+    cpu_affinity: str = Field("", env="GIMMEFY_CPU_AFFINITY")
+    warmup: bool = Field(True, env="GIMMEFY_INFERENCE_WARMUP")
+
+    worker_addresses: str = Field("", env="GIMMEFY_INFERENCE_WORKERS")
+    worker_authkey: str = Field("", env="GIMMEFY_INFERENCE_AUTHKEY")
+
+    batch_max_size: int = Field(8, env="GIMMEFY_BATCH_MAX_SIZE")
+    batch_window_ms: int = Field(20, env="GIMMEFY_BATCH_WINDOW_MS")
+    prompt_cache_size: int = Field(32, env="GIMMEFY_PROMPT_CACHE_SIZE")
+
+    slots: int = Field(1, env="GIMMEFY_INFERENCE_SLOTS")
+    max_queue_depth: int = Field(16, env="GIMMEFY_INFERENCE_QUEUE_DEPTH")
+
+    pool_low_watermark: int = Field(2, env="GIMMEFY_POOL_LOW_WATERMARK")
+    pool_high_watermark: int = Field(8, env="GIMMEFY_POOL_HIGH_WATERMARK")
+    pool_max_prompts: int = Field(64, env="GIMMEFY_POOL_MAX_PROMPTS")
+    pool_interval_ms: int = Field(500, env="GIMMEFY_POOL_INTERVAL_MS")
+
+
 class GimmefyServerConfig(EnvSettings):
     """Telemetry server configuration."""
 
@@ -34,5 +67,26 @@ class GimmefyServerConfig(EnvSettings):
     default_exp: int = Field(0, env="GIMMEFY_DEFAULT_EXP")
     default_money: int = Field(200, env="GIMMEFY_DEFAULT_MONEY")
 
+    tip_max_retries: int = Field(3, env="GIMMEFY_TIP_MAX_RETRIES")
+    tip_deadline_ms: int = Field(5000, env="GIMMEFY_TIP_DEADLINE_MS")
+    tip_cache_size: int = Field(10000, env="GIMMEFY_TIP_CACHE_SIZE")
+    tip_cache_ttl: int = Field(86400, env="GIMMEFY_TIP_CACHE_TTL")
+
+    store_check_interval: float = Field(
+        1.0,
+        env="GIMMEFY_STORE_CHECK_INTERVAL"
+    )
+
+    write_behind: bool = Field(False, env="GIMMEFY_WRITE_BEHIND")
+    write_behind_interval_ms: int = Field(
+        1000,
+        env="GIMMEFY_WRITE_BEHIND_INTERVAL_MS"
+    )
+    write_behind_max_pending: int = Field(
+        1000,
+        env="GIMMEFY_WRITE_BEHIND_MAX_PENDING"
+    )
+
     mongo: MongoDBParams = MongoDBParams()  # type: ignore
+    inference: InferenceParams = InferenceParams()
     store_path: Path = Field(..., env="GIMMEFY_STORE_PATH")
@@ -0,0 +1,24 @@
+"""Gunicorn config.
+
+Run with ``gunicorn -c gunicorn_conf.py app:app``. With
+GIMMEFY_INFERENCE_PRELOAD=true the model is loaded once in the master
+and workers share its pages.
+"""
+import multiprocessing
+import os
+
+import yaml
+
+from config import InferenceParams
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", 0)) or max(
+    1,
+    int(float(os.getenv("WORKERS_PER_CORE", 1)) * multiprocessing.cpu_count())
+)
+# Mongo clients are made after fork in the app startup, see Server.
+preload_app = InferenceParams().preload
+forwarded_allow_ips = "*"
+with open("log_config.yaml") as log_config:
+    logconfig_dict = yaml.safe_load(log_config)
@@ -0,0 +1,66 @@
+"""In-process caches."""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+def _next_midnight() -> float:
+    """Timestamp of the next UTC day rollover."""
+    today = datetime.now(timezone.utc).date()
+    midnight = datetime(
+        today.year,
+        today.month,
+        today.day,
+        tzinfo=timezone.utc
+    ) + timedelta(days=1)
+    return midnight.timestamp()
+
+
+class TTLCache(Generic[V]):
+    """Bounded LRU cache whose entries expire after ttl seconds.
+
+    With ``daily`` set, entries also expire at the next UTC midnight.
+    """
+
+    def __init__(self, max_size: int, ttl: float, daily: bool = False):
+        """Initialize the cache."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.daily = daily
+        self._items: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return cached value or None if missing or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Store value under key."""
+        if self.max_size <= 0:
+            return
+        expires = time.time() + self.ttl
+        if self.daily:
+            expires = min(expires, _next_midnight())
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,115 @@
+"""Indexes declared by models and a check that helper queries use them.
+
+Indexes are created at startup; to verify the query plans run::
+
+    python -m helpers.indexes
+"""
+import argparse
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pymongo import IndexModel
+from sqlmodel import SQLModel
+
+from mongo import AsyncDatabase, get_async_mongo_client
+from models.users import User
+from models.objects import ObjTable, ObjChair, ObjMisc
+from models.rules import RuleLevel, RuleItem
+
+INDEXED_MODELS: Tuple[Type[SQLModel], ...] = (
+    User,
+    ObjTable,
+    ObjChair,
+    ObjMisc,
+    RuleLevel,
+    RuleItem,
+)
+
+# Filter and sort of every lookup the helpers make.
+HELPER_QUERIES: List[Tuple[Type[SQLModel], Dict[str, Any], Optional[list]]] = [
+    (User, {"username": ""}, None),
+    *[
+        (type, filter, None)
+        for type in (ObjTable, ObjChair, ObjMisc)
+        for filter in ({"id": ""}, {"id": {"$in": [""]}})
+    ],
+    *[
+        (type, filter, sort)
+        for type in (RuleLevel, RuleItem)
+        for filter, sort in (
+            ({"level": 0}, None),
+            ({"exp_gte": {"$lt": 0}}, [("exp_gte", -1)]),
+        )
+    ],
+]
+
+
+async def ensure_indexes(
+    db: AsyncDatabase,
+) -> List[str]:
+    """Create indexes declared by models, return their names."""
+    names: List[str] = []
+    for model in INDEXED_MODELS:
+        names += await db[model.__colname__].create_indexes([
+            IndexModel(**index)
+            for index in model.__indexes__
+        ])
+    return names
+
+
+def _stages(plan: Any) -> List[str]:
+    """Stage names of a query plan tree."""
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for value in plan.values():
+        stages += _stages(value)
+    return stages
+
+
+async def check_query_plans(
+    db: AsyncDatabase,
+) -> List[str]:
+    """Explain helper queries, return descriptions of collection scans."""
+    scans: List[str] = []
+    for model, filter, sort in HELPER_QUERIES:
+        cursor = db[model.__colname__].find(filter)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            scans.append(f"{model.__colname__} {filter} sort={sort}")
+    return scans
+
+
+async def _main(create: bool) -> int:
+    from config import MongoDBParams
+
+    mongo = MongoDBParams()  # type: ignore
+    db = get_async_mongo_client(mongo)[mongo.db]
+    if create:
+        await ensure_indexes(db)
+    scans = await check_query_plans(db)
+    for scan in scans:
+        print("COLLSCAN", scan)
+    return 1 if scans else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that helper queries do not scan collections."
+    )
+    parser.add_argument(
+        "--create",
+        action="store_true",
+        help="create declared indexes first"
+    )
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.create)))
+
+
+if __name__ == "__main__":
+    main()
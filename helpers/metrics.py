@@ -0,0 +1,15 @@
+"""Process-local counters."""
+from collections import Counter
+from typing import Dict
+
+_counters: Counter = Counter()
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increase counter by value."""
+    _counters[name] += value
+
+
+def get_counters() -> Dict[str, int]:
+    """Get a copy of all counters."""
+    return dict(_counters)
@@ -1,6 +1,6 @@
-from typing import Optional, Type, overload, List
+from typing import Dict, Iterable, List, Optional, Tuple, Type, overload
 
-from mongo import Database, ObjectId
+from mongo import AsyncDatabase, ObjectId
 
 from models.objects import (
     ObjTable,
@@ -8,11 +8,12 @@ from models.objects import (
     ObjMisc,
     ObjBase
 )
+from helpers.sync import sync_collection
 
 
 @overload
-def get_obj_by_id(
-    db: Database,
+async def get_obj_by_id(
+    db: AsyncDatabase,
     id: str,
     type: Type[ObjTable]
 ) -> Optional[ObjTable]:
@@ -21,8 +22,8 @@ def get_obj_by_id(
 
 
 @overload
-def get_obj_by_id(
-    db: Database,
+async def get_obj_by_id(
+    db: AsyncDatabase,
     id: str,
     type: Type[ObjChair]
 ) -> Optional[ObjChair]:
@@ -31,8 +32,8 @@ def get_obj_by_id(
 
 
 @overload
-def get_obj_by_id(
-    db: Database,
+async def get_obj_by_id(
+    db: AsyncDatabase,
     id: str,
     type: Type[ObjMisc]
 ) -> Optional[ObjMisc]:
@@ -40,13 +41,13 @@ def get_obj_by_id(
     ...
 
 
-def get_obj_by_id(
-    db: Database,
+async def get_obj_by_id(
+    db: AsyncDatabase,
     id: str,
     type: Type[ObjBase]
 ) -> Optional[ObjBase]:
     """Get obj by id."""
-    data = db[type.__colname__].find_one(
+    data = await db[type.__colname__].find_one(
         filter={"id": id}
     )
     if data is None:
@@ -55,8 +56,8 @@ def get_obj_by_id(
 
 
 @overload
-def get_objs(
-    db: Database,
+async def get_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjTable]
 ) -> List[ObjTable]:
@@ -65,8 +66,8 @@ def get_objs(
 
 
 @overload
-def get_objs(
-    db: Database,
+async def get_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjChair]
 ) -> List[ObjChair]:
@@ -75,8 +76,8 @@ def get_objs(
 
 
 @overload
-def get_objs(
-    db: Database,
+async def get_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjMisc]
 ) -> List[ObjMisc]:
@@ -84,8 +85,8 @@ def get_objs(
     ...
 
 
-def get_objs(
-    db: Database,
+async def get_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjBase]
 ) -> List[ObjBase]:
@@ -94,14 +95,14 @@ def get_objs(
         filter=filter
     )
     resp: List[ObjBase] = []
-    for rec in data:
+    async for rec in data:
         resp.append(type(**rec))
     return resp
 
 
 @overload
-def create_obj(
-    db: Database,
+async def create_obj(
+    db: AsyncDatabase,
     obj: ObjTable,
 ) -> ObjectId:
     """Create table."""
@@ -109,8 +110,8 @@ def create_obj(
 
 
 @overload
-def create_obj(
-    db: Database,
+async def create_obj(
+    db: AsyncDatabase,
     obj: ObjChair,
 ) -> ObjectId:
     """Create chair."""
@@ -118,27 +119,28 @@ def create_obj(
 
 
 @overload
-def create_obj(
-    db: Database,
+async def create_obj(
+    db: AsyncDatabase,
     obj: ObjMisc,
 ) -> ObjectId:
     """Create misc."""
     ...
 
 
-def create_obj(
-    db: Database,
+async def create_obj(
+    db: AsyncDatabase,
     obj: ObjBase,
 ) -> ObjectId:
     """Create obj."""
-    return db[obj.__colname__].insert_one(
+    result = await db[obj.__colname__].insert_one(
         document=obj.dict()
-    ).inserted_id
+    )
+    return result.inserted_id
 
 
 @overload
-def update_obj(
-    db: Database,
+async def update_obj(
+    db: AsyncDatabase,
     obj: ObjTable,
 ) -> int:
     """Update table."""
@@ -146,8 +148,8 @@ def update_obj(
 
 
 @overload
-def update_obj(
-    db: Database,
+async def update_obj(
+    db: AsyncDatabase,
     obj: ObjChair,
 ) -> int:
     """Update chair."""
@@ -155,28 +157,29 @@ def update_obj(
 
 
 @overload
-def update_obj(
-    db: Database,
+async def update_obj(
+    db: AsyncDatabase,
     obj: ObjMisc,
 ) -> int:
     """Update misc."""
     ...
 
 
-def update_obj(
-    db: Database,
+async def update_obj(
+    db: AsyncDatabase,
     obj: ObjBase,
 ) -> int:
     """Update obj."""
-    return db[obj.__colname__].update_one(
+    result = await db[obj.__colname__].update_one(
         filter={"id": obj.id},
         update={"$set": obj.dict()},
-    ).modified_count
+    )
+    return result.modified_count
 
 
 @overload
-def upsert_obj(
-    db: Database,
+async def upsert_obj(
+    db: AsyncDatabase,
     obj: ObjTable,
 ) -> int:
     """Upsert table."""
@@ -184,8 +187,8 @@ def upsert_obj(
 
 
 @overload
-def upsert_obj(
-    db: Database,
+async def upsert_obj(
+    db: AsyncDatabase,
     obj: ObjChair,
 ) -> int:
     """Upsert chair."""
@@ -193,29 +196,30 @@ def upsert_obj(
 
 
 @overload
-def upsert_obj(
-    db: Database,
+async def upsert_obj(
+    db: AsyncDatabase,
     obj: ObjMisc,
 ) -> int:
     """Upsert misc."""
     ...
 
 
-def upsert_obj(
-    db: Database,
+async def upsert_obj(
+    db: AsyncDatabase,
     obj: ObjBase,
 ) -> int:
     """Create obj."""
-    return db[obj.__colname__].update_one(
+    result = await db[obj.__colname__].update_one(
         filter={"id": obj.id},
         update={"$set": obj.dict()},
         upsert=True
-    ).modified_count
+    )
+    return result.modified_count
 
 
 @overload
-def delete_objs(
-    db: Database,
+async def delete_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjTable]
 ) -> int:
@@ -224,8 +228,8 @@ def delete_objs(
 
 
 @overload
-def delete_objs(
-    db: Database,
+async def delete_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjChair]
 ) -> int:
@@ -234,8 +238,8 @@ def delete_objs(
 
 
 @overload
-def delete_objs(
-    db: Database,
+async def delete_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjMisc]
 ) -> int:
@@ -243,12 +247,102 @@ def delete_objs(
     ...
 
 
-def delete_objs(
-    db: Database,
+async def delete_objs(
+    db: AsyncDatabase,
     filter: dict,
     type: Type[ObjBase]
 ) -> int:
     """Delete obj by id."""
-    return db[type.__colname__].delete_many(
+    result = await db[type.__colname__].delete_many(
         filter=filter
-    ).deleted_count
+    )
+    return result.deleted_count
+
+
+async def sync_objs(
+    db: AsyncDatabase,
+    objs: List[ObjBase],
+    type: Type[ObjBase]
+) -> Tuple[int, int]:
+    """Replace all objs of type, writing only changes."""
+    return await sync_collection(
+        db[type.__colname__],
+        "id",
+        [obj.dict() for obj in objs]
+    )
+
+
+OBJ_TYPES = (ObjTable, ObjChair, ObjMisc)
+
+
+class ObjCatalog:
+    """All store objects indexed by id per type."""
+
+    def __init__(self, objs: Dict[Type[ObjBase], List[ObjBase]]):
+        """Initialize the catalog."""
+        self._objs = objs
+        self._by_id: Dict[Type[ObjBase], Dict[str, ObjBase]] = {}
+        for type, type_objs in objs.items():
+            by_id: Dict[str, ObjBase] = {}
+            for obj in type_objs:
+                by_id.setdefault(obj.id, obj)
+            self._by_id[type] = by_id
+
+    @overload
+    def get(self, id: str, type: Type[ObjTable]) -> Optional[ObjTable]:
+        ...
+
+    @overload
+    def get(self, id: str, type: Type[ObjChair]) -> Optional[ObjChair]:
+        ...
+
+    @overload
+    def get(self, id: str, type: Type[ObjMisc]) -> Optional[ObjMisc]:
+        ...
+
+    def get(self, id: str, type: Type[ObjBase]) -> Optional[ObjBase]:
+        """Get obj by id."""
+        return self._by_id[type].get(id)
+
+    @overload
+    def get_many(
+        self,
+        ids: Iterable[str],
+        type: Type[ObjTable]
+    ) -> List[ObjTable]:
+        ...
+
+    @overload
+    def get_many(
+        self,
+        ids: Iterable[str],
+        type: Type[ObjChair]
+    ) -> List[ObjChair]:
+        ...
+
+    @overload
+    def get_many(
+        self,
+        ids: Iterable[str],
+        type: Type[ObjMisc]
+    ) -> List[ObjMisc]:
+        ...
+
+    def get_many(
+        self,
+        ids: Iterable[str],
+        type: Type[ObjBase]
+    ) -> List[ObjBase]:
+        """Get objs with any of ids, in store order like an $in query."""
+        wanted = set(ids)
+        return [obj for obj in self._objs[type] if obj.id in wanted]
+
+
+async def get_obj_catalog(
+    db: AsyncDatabase,
+) -> ObjCatalog:
+    """Load all objects."""
+    return ObjCatalog({
+        type: await get_objs(db, {}, type)
+        for type in OBJ_TYPES
+    })
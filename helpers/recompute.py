@@ -0,0 +1,207 @@
+"""Recompute stored user levels after a rules change.
+
+Users keep their level fields until the next telemetry hit, so after
+``rule_levels`` or ``rule_items`` change every user is brought up to
+date in chunks, writing only the ones that actually changed. The job
+runs in a thread or from the command line, so it uses the blocking
+driver::
+
+    python -m helpers.recompute
+"""
+import argparse
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+
+from mongo import Collection, Database, get_mongo_client
+from models.rules import RuleItem, RuleLevel
+from models.users import User
+from helpers.rules import LVL_MAP, RuleBook, RuleLadder
+
+CHUNK_SIZE = 10000
+
+PROJECTION = {
+    "total_exp": True,
+    "level": True,
+    "level_name": True,
+    "year": True,
+    "until_next_level": True,
+    "item_level": True,
+    "next_item": True,
+    "until_next_item": True,
+}
+
+
+class _Steps(NamedTuple):
+    """Rule ladder as arrays."""
+
+    thresholds: np.ndarray
+    levels: np.ndarray
+    # Threshold and name of the rule for each level, indexed by level.
+    exp_by_level: np.ndarray
+    name_by_level: List[str]
+
+
+def _ladder_steps(ladder: RuleLadder) -> _Steps:
+    levels = np.array([rule.level for rule in ladder.rules], dtype=np.int64)
+    size = int(levels.max()) + 2 if len(levels) else 1
+    exp_by_level = np.full(size, np.nan)
+    name_by_level = [""] * size
+    for level in set(levels.tolist()):
+        rule = ladder.by_level(level)
+        exp_by_level[level] = rule.exp_gte
+        name_by_level[level] = getattr(rule, "item", "")
+    return _Steps(
+        thresholds=np.array(ladder.thresholds, dtype=np.float64),
+        levels=levels,
+        exp_by_level=exp_by_level,
+        name_by_level=name_by_level,
+    )
+
+
+def _climb(steps: _Steps, exp: np.ndarray, current: np.ndarray):
+    """Vectorized by_exp / by_level lookups of UserServer._promote_user.
+
+    Return whether a rule was reached, the new level, the exp left until
+    the next level (0 on the last one) and the next level.
+    """
+    index = np.searchsorted(steps.thresholds, exp, side="left") - 1
+    found = index >= 0
+    reached = steps.levels[np.maximum(index, 0)] if len(steps.levels) else 0
+    level = np.where(found & (reached >= current), reached, current)
+    next_level = np.minimum(level + 1, len(steps.exp_by_level) - 1)
+    next_exp = steps.exp_by_level[next_level]
+    until_next = np.where(np.isnan(next_exp), 0.0, next_exp - exp)
+    return found, level, until_next, next_level
+
+
+def _changes(
+    doc: Dict[str, Any],
+    fields: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {
+        name: value
+        for name, value in fields.items()
+        if doc.get(name) != value
+    }
+
+
+def _chunk_updates(
+    docs: List[Dict[str, Any]],
+    levels: _Steps,
+    items: _Steps,
+) -> List[UpdateOne]:
+    """Build updates for the users of a chunk whose fields changed."""
+    exp = np.array([doc["total_exp"] for doc in docs], dtype=np.float64)
+    _, level, until_next_level, _ = _climb(
+        levels,
+        exp,
+        np.array([doc.get("level", 1) for doc in docs], dtype=np.int64),
+    )
+    item_found, item_level, until_next_item, next_item = _climb(
+        items,
+        exp,
+        np.array([doc.get("item_level", 1) for doc in docs], dtype=np.int64),
+    )
+
+    updates: List[UpdateOne] = []
+    for i, doc in enumerate(docs):
+        fields: Dict[str, Any] = {
+            "level": int(level[i]),
+            "until_next_level": float(until_next_level[i]),
+        }
+        names = LVL_MAP.get(fields["level"])
+        if names is not None:
+            fields.update(names)
+        if item_found[i]:
+            fields["item_level"] = int(item_level[i])
+            fields["until_next_item"] = float(until_next_item[i])
+            fields["next_item"] = items.name_by_level[next_item[i]]
+        changes = _changes(doc, fields)
+        if changes:
+            # Skip users promoted meanwhile, their request recomputed it.
+            updates.append(UpdateOne(
+                filter={"_id": doc["_id"], "total_exp": doc["total_exp"]},
+                update={"$set": changes},
+            ))
+    return updates
+
+
+def _write_chunk(
+    collection: Collection,
+    docs: List[Dict[str, Any]],
+    levels: _Steps,
+    items: _Steps,
+) -> int:
+    updates = _chunk_updates(docs, levels, items)
+    if not updates:
+        return 0
+    return collection.bulk_write(
+        updates,
+        ordered=False
+    ).modified_count
+
+
+def _load_rule_book(
+    db: Database,
+) -> RuleBook:
+    return RuleBook(
+        levels=RuleLadder([
+            RuleLevel(**rule)
+            for rule in db[RuleLevel.__colname__].find({})
+        ]),
+        items=RuleLadder([
+            RuleItem(**rule)
+            for rule in db[RuleItem.__colname__].find({})
+        ]),
+    )
+
+
+def recompute_users(
+    db: Database,
+    rules: Optional[RuleBook] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """Bring level fields of all users up to date with rules.
+
+    Return the number of modified users.
+    """
+    if rules is None:
+        rules = _load_rule_book(db)
+    levels = _ladder_steps(rules.levels)
+    items = _ladder_steps(rules.items)
+    collection = db[User.__colname__]
+
+    modified_count = 0
+    docs: List[Dict[str, Any]] = []
+    cursor = collection.find(
+        filter={},
+        projection=PROJECTION,
+        batch_size=chunk_size
+    )
+    for doc in cursor:
+        docs.append(doc)
+        if len(docs) >= chunk_size:
+            modified_count += _write_chunk(collection, docs, levels, items)
+            docs = []
+    if docs:
+        modified_count += _write_chunk(collection, docs, levels, items)
+    return modified_count
+
+
+def main() -> None:
+    from config import MongoDBParams
+
+    parser = argparse.ArgumentParser(
+        description="Recompute user levels from current rules."
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    mongo = MongoDBParams()  # type: ignore
+    db = get_mongo_client(mongo)[mongo.db]
+    print(recompute_users(db, chunk_size=args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
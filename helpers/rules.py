@@ -1,19 +1,50 @@
-from typing import Optional, List
+from bisect import bisect_left
+from typing import (
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union
+)
 
-from mongo import Database, ObjectId
+from mongo import AsyncDatabase, ObjectId
 
 from models.rules import (
     RuleItem,
     RuleLevel
 )
+from helpers.sync import sync_collection
+
+R = TypeVar("R", bound=Union[RuleLevel, RuleItem])
 
+LVL_MAP = {
+    1: {"level_name": "абитуриент", "year": ""},
+    2: {"level_name": "бакалавр", "year": "1 курс"},
+    3: {"level_name": "бакалавр", "year": "2 курс"},
+    4: {"level_name": "бакалавр", "year": "3 курс"},
+    5: {"level_name": "бакалавр", "year": "4 курс"},
+    6: {"level_name": "магистр", "year": "1 курс"},
+    7: {"level_name": "магистр", "year": "2 курс"},
+    8: {"level_name": "аспирант", "year": "1 курс"},
+    9: {"level_name": "аспирант", "year": "2 курс"},
+    10: {"level_name": "аспирант", "year": "3 курс"},
+    11: {"level_name": "аспирант", "year": "4 курс"},
+    12: {"level_name": "кандидат наук", "year": ""},
+    13: {"level_name": "доктор наук", "year": ""},
+    14: {"level_name": "доктор наук", "year": ""},
+    15: {"level_name": "доктор наук", "year": ""},
+}
 
-def get_rule_level_by_level(
-    db: Database,
+
+async def get_rule_level_by_level(
+    db: AsyncDatabase,
     level: int,
 ) -> Optional[RuleLevel]:
     """Get rule by level."""
-    data = db[RuleLevel.__colname__].find_one(
+    data = await db[RuleLevel.__colname__].find_one(
         filter={"level": level}
     )
     if data is None:
@@ -21,12 +52,12 @@ def get_rule_level_by_level(
     return RuleLevel(**data)
 
 
-def get_rule_level_by_exp(
-    db: Database,
+async def get_rule_level_by_exp(
+    db: AsyncDatabase,
     exp: float,
 ) -> Optional[RuleLevel]:
     """Get rule by level."""
-    data = db[RuleLevel.__colname__].find_one(
+    data = await db[RuleLevel.__colname__].find_one(
         filter={"exp_gte": {"$lt": exp}},
         sort=[("exp_gte", -1)]
     )
@@ -35,12 +66,12 @@ def get_rule_level_by_exp(
     return RuleLevel(**data)
 
 
-def get_rule_item_by_level(
-    db: Database,
+async def get_rule_item_by_level(
+    db: AsyncDatabase,
     level: int,
 ) -> Optional[RuleItem]:
     """Get rule by level."""
-    data = db[RuleItem.__colname__].find_one(
+    data = await db[RuleItem.__colname__].find_one(
         filter={"level": level}
     )
     if data is None:
@@ -48,12 +79,12 @@ def get_rule_item_by_level(
     return RuleItem(**data)
 
 
-def get_rule_item_by_exp(
-    db: Database,
+async def get_rule_item_by_exp(
+    db: AsyncDatabase,
     exp: float,
 ) -> Optional[RuleItem]:
     """Get rule by level."""
-    data = db[RuleItem.__colname__].find_one(
+    data = await db[RuleItem.__colname__].find_one(
         filter={"exp_gte": {"$lt": exp}},
         sort=[("exp_gte", -1)]
     )
@@ -62,8 +93,8 @@ def get_rule_item_by_exp(
     return RuleItem(**data)
 
 
-def get_rule_levels(
-    db: Database,
+async def get_rule_levels(
+    db: AsyncDatabase,
     filter: dict
 ) -> List[RuleLevel]:
     """Get rule by level."""
@@ -71,56 +102,72 @@ def get_rule_levels(
         filter=filter
     )
     rules: List[RuleLevel] = []
-    for rule in data:
+    async for rule in data:
         rules.append(RuleLevel(**rule))
     return rules
 
 
-def create_rule_level(
-    db: Database,
+async def create_rule_level(
+    db: AsyncDatabase,
     rule: RuleLevel,
 ) -> ObjectId:
     """Create rule."""
-    return db[rule.__colname__].insert_one(
+    result = await db[rule.__colname__].insert_one(
         document=rule.dict()
-    ).inserted_id
+    )
+    return result.inserted_id
 
 
-def update_rule_level(
-    db: Database,
+async def update_rule_level(
+    db: AsyncDatabase,
     rule: RuleLevel,
 ) -> int:
     """Update rule."""
-    return db[rule.__colname__].update_one(
-        filter={"id": rule.level},
+    result = await db[rule.__colname__].update_one(
+        filter={"level": rule.level},
         update={"$set": rule.dict()},
-    ).modified_count
+    )
+    return result.modified_count
 
 
-def upsert_rule_level(
-    db: Database,
+async def upsert_rule_level(
+    db: AsyncDatabase,
     rule: RuleLevel,
 ) -> int:
     """Create rule."""
-    return db[rule.__colname__].update_one(
-        filter={"id": rule.level},
+    result = await db[rule.__colname__].update_one(
+        filter={"level": rule.level},
         update={"$set": rule.dict()},
         upsert=True
-    ).modified_count
+    )
+    return result.modified_count
 
 
-def delete_rule_levels(
-    db: Database,
+async def delete_rule_levels(
+    db: AsyncDatabase,
     filter: dict
 ) -> int:
     """Delete rules."""
-    return db[RuleLevel.__colname__].delete_many(
+    result = await db[RuleLevel.__colname__].delete_many(
         filter=filter
-    ).deleted_count
+    )
+    return result.deleted_count
 
 
-def get_rule_items(
-    db: Database,
+async def sync_rule_levels(
+    db: AsyncDatabase,
+    rules: List[RuleLevel],
+) -> Tuple[int, int]:
+    """Replace all rules, writing only changes."""
+    return await sync_collection(
+        db[RuleLevel.__colname__],
+        "level",
+        [rule.dict() for rule in rules]
+    )
+
+
+async def get_rule_items(
+    db: AsyncDatabase,
     filter: dict
 ) -> List[RuleItem]:
     """Get rule by item."""
@@ -128,49 +175,108 @@ def get_rule_items(
         filter=filter
     )
     rules: List[RuleItem] = []
-    for rule in data:
+    async for rule in data:
         rules.append(RuleItem(**rule))
     return rules
 
 
-def create_rule_item(
-    db: Database,
+async def create_rule_item(
+    db: AsyncDatabase,
     rule: RuleItem,
 ) -> ObjectId:
     """Create rule."""
-    return db[rule.__colname__].insert_one(
+    result = await db[rule.__colname__].insert_one(
         document=rule.dict()
-    ).inserted_id
+    )
+    return result.inserted_id
 
 
-def update_rule_item(
-    db: Database,
+async def update_rule_item(
+    db: AsyncDatabase,
     rule: RuleItem,
 ) -> int:
     """Update rule."""
-    return db[rule.__colname__].update_one(
-        filter={"id": rule.item},
+    result = await db[rule.__colname__].update_one(
+        filter={"level": rule.level},
         update={"$set": rule.dict()},
-    ).modified_count
+    )
+    return result.modified_count
 
 
-def upsert_rule_item(
-    db: Database,
+async def upsert_rule_item(
+    db: AsyncDatabase,
     rule: RuleItem,
 ) -> int:
     """Create rule."""
-    return db[rule.__colname__].update_one(
-        filter={"id": rule.item},
+    result = await db[rule.__colname__].update_one(
+        filter={"level": rule.level},
         update={"$set": rule.dict()},
         upsert=True
-    ).modified_count
+    )
+    return result.modified_count
 
 
-def delete_rule_items(
-    db: Database,
+async def delete_rule_items(
+    db: AsyncDatabase,
     filter: dict
 ) -> int:
     """Delete rules."""
-    return db[RuleItem.__colname__].delete_many(
+    result = await db[RuleItem.__colname__].delete_many(
         filter=filter
-    ).deleted_count
+    )
+    return result.deleted_count
+
+
+async def sync_rule_items(
+    db: AsyncDatabase,
+    rules: List[RuleItem],
+) -> Tuple[int, int]:
+    """Replace all rules, writing only changes."""
+    return await sync_collection(
+        db[RuleItem.__colname__],
+        "level",
+        [rule.dict() for rule in rules]
+    )
+
+
+class RuleLadder(Generic[R]):
+    """Rules sorted by exp threshold for in-memory lookups."""
+
+    def __init__(self, rules: List[R]):
+        """Initialize the ladder."""
+        self.rules: List[R] = sorted(rules, key=lambda rule: rule.exp_gte)
+        self.thresholds: List[int] = [rule.exp_gte for rule in self.rules]
+        self._by_level: Dict[int, R] = {}
+        for rule in self.rules:
+            self._by_level.setdefault(rule.level, rule)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, RuleLadder) and self.rules == other.rules
+
+    def by_exp(self, exp: float) -> Optional[R]:
+        """Get the rule with the highest threshold below exp."""
+        index = bisect_left(self.thresholds, exp)
+        if not index:
+            return None
+        return self.rules[index - 1]
+
+    def by_level(self, level: int) -> Optional[R]:
+        """Get rule by level."""
+        return self._by_level.get(level)
+
+
+class RuleBook(NamedTuple):
+    """Level and item rules."""
+
+    levels: RuleLadder[RuleLevel]
+    items: RuleLadder[RuleItem]
+
+
+async def get_rule_book(
+    db: AsyncDatabase,
+) -> RuleBook:
+    """Load all rules."""
+    return RuleBook(
+        levels=RuleLadder(await get_rule_levels(db, {})),
+        items=RuleLadder(await get_rule_items(db, {})),
+    )
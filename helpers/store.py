@@ -0,0 +1,87 @@
+"""Store snapshot."""
+import gzip
+import hashlib
+from typing import Dict, NamedTuple, Optional
+
+from mongo import AsyncDatabase
+
+from models.store import Store
+from models.objects import (
+    ObjTable,
+    ObjChair,
+    ObjMisc,
+)
+from helpers.objects import get_objs
+from helpers.rules import get_rule_levels, get_rule_items
+
+
+class StoreSnapshot(NamedTuple):
+    """Serialized store with the ETags of its plain and gzip bodies."""
+
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    gzip_etag: str
+
+
+async def get_store(
+    db: AsyncDatabase,
+) -> Store:
+    """Load the whole store."""
+    return Store(
+        rule_levels=await get_rule_levels(db, {}),
+        rule_items=await get_rule_items(db, {}),
+        tables=await get_objs(db, {}, ObjTable),
+        chairs=await get_objs(db, {}, ObjChair),
+        misc=await get_objs(db, {}, ObjMisc),
+    )
+
+
+async def get_store_snapshot(
+    db: AsyncDatabase,
+) -> StoreSnapshot:
+    """Serialize and compress the store once."""
+    store = await get_store(db)
+    body = store.json(ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return StoreSnapshot(
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+        etag=f'"{digest}"',
+        # Another representation needs another strong validator.
+        gzip_etag=f'"{digest}-gz"',
+    )
+
+
+def etag_matches(
+    if_none_match: Optional[str],
+    etag: str,
+) -> bool:
+    """Check If-None-Match header against etag."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.replace("W/", "", 1) == etag:
+            return True
+    return False
+
+
+def accepts_gzip(
+    accept_encoding: Optional[str],
+) -> bool:
+    """Check Accept-Encoding header for gzip.
+
+    An explicit gzip entry wins over ``*``.
+    """
+    if not accept_encoding:
+        return False
+    qualities: Dict[str, bool] = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        quality = params.strip().replace(" ", "")
+        qualities.setdefault(
+            name.strip().lower(),
+            quality not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+        )
+    return qualities.get("gzip", qualities.get("*", False))
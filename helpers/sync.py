@@ -0,0 +1,48 @@
+"""Bulk sync of small store collections."""
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, DeleteMany, InsertOne, ReplaceOne
+
+from mongo import AsyncCollection
+
+
+async def sync_collection(
+    collection: AsyncCollection,
+    key: str,
+    docs: List[Dict[str, Any]],
+) -> Tuple[int, int]:
+    """Make collection hold exactly docs, matching documents on key.
+
+    Only changed documents are written, in one ordered bulk_write that
+    first drops duplicates and documents missing from docs. Return the
+    number of inserted or modified and of deleted documents.
+    """
+    wanted = {doc[key]: doc for doc in docs}
+    current: Dict[Any, Tuple[Any, Dict[str, Any]]] = {}
+    stale: List[Any] = []
+    async for doc in collection.find({}):
+        _id = doc.pop("_id")
+        if doc.get(key) in current or doc.get(key) not in wanted:
+            stale.append(_id)
+        else:
+            current[doc[key]] = (_id, doc)
+
+    requests: List[Any] = []
+    if stale:
+        requests.append(DeleteMany({"_id": {"$in": stale}}))
+    for value, doc in wanted.items():
+        if value not in current:
+            requests.append(InsertOne(dict(doc)))
+            continue
+        _id, old = current[value]
+        if old != doc:
+            requests.append(ReplaceOne({"_id": _id}, doc))
+
+    modified_count = 0
+    deleted_count = 0
+    if requests:
+        result = await collection.bulk_write(requests, ordered=True)
+        modified_count = result.inserted_count + result.modified_count
+        deleted_count = result.deleted_count
+    await collection.create_index([(key, ASCENDING)], unique=True)
+    return modified_count, deleted_count
@@ -1,14 +1,26 @@
+import asyncio
 import re
 from datetime import datetime, timezone
+from logging import getLogger
 import math
 from random import choice
-from typing import Optional, List
+from typing import AsyncIterator, Callable, Optional, List, Tuple
 
-from mongo import Database
+from mongo import AsyncDatabase
 
+from inference import (
+    BatchScheduler,
+    InferenceClientError,
+    InferenceOverloaded,
+    TextPool
+)
 from models.users import User, UserTip
+from helpers.cache import TTLCache
+from helpers.metrics import incr
 from helpers.rules import get_rule_level_by_level
 
+log = getLogger(__name__)
+
 
 def calc_score(
     total_score: float,
@@ -30,32 +42,11 @@ def calc_score(
     )
 
 
-def _ask_model(model, tokenizer, query):
-    encoded_prompt = tokenizer.encode(
-        query,
-        add_special_tokens=False,
-        return_tensors='pt'
-    )
-    encoded_bad = tokenizer.encode("секс", add_prefix_space=True)
-    output_sequences = model.generate(
-        input_ids=encoded_prompt,
-        max_length=40,
-        min_length=30,
-        top_k=5,
-        top_p=0.95,
-        do_sample=True,
-        bad_words_ids=[encoded_bad],
-    )
-    if len(output_sequences.shape) > 2:
-        output_sequences.squeeze_()
-    text = tokenizer.decode(
-        output_sequences[0],
-        clean_up_tokenization_spaces=True
-    )
-    return str(text)
+async def _ask_model(scheduler: BatchScheduler, query: str) -> str:
+    return await scheduler.submit(query)
 
 
-def _tip_gen_mot(db: Database, user: User) -> str:
+def _tip_gen_mot(db: AsyncDatabase, user: User) -> str:
     """Фразы-мотиваторы."""
     tips = [
         "сейчас бы решить какую-нибудь задачку!",
@@ -64,7 +55,7 @@ def _tip_gen_mot(db: Database, user: User) -> str:
     return choice(tips).capitalize()
 
 
-# def _tip_gen_prj(db: Database, user: User) -> str:
+# def _tip_gen_prj(db: AsyncDatabase, user: User) -> str:
 #     """Выдержки из описания проекта."""
 #     total_users = db[User.__colname__].count({})
 #     tips = [
@@ -73,14 +64,14 @@ def _tip_gen_mot(db: Database, user: User) -> str:
 #     return choice(tips).capitalize()
 
 
-def _tip_gen_lab(db: Database, user: User) -> str:
+def _tip_gen_lab(db: AsyncDatabase, user: User) -> str:
     tips = [
         f"скорее бы уже {user.next_item}..."
     ]
     return choice(tips).capitalize()
 
 
-def _tip_gen_avatar(db: Database, user: User) -> str:
+def _tip_gen_avatar(db: AsyncDatabase, user: User) -> str:
     """Фразы научного-сотрудника."""
     tips = [
         "хочу селекционировать новый вид хищных растений.",
@@ -91,7 +82,7 @@ def _tip_gen_avatar(db: Database, user: User) -> str:
     return choice(tips).capitalize()
 
 
-def _tip_gen_general(db: Database, user: User) -> str:
+def _tip_gen_general(db: AsyncDatabase, user: User) -> str:
     """Фразы научного-сотрудника."""
     tips = [
         "здравствуй!",
@@ -102,7 +93,7 @@ def _tip_gen_general(db: Database, user: User) -> str:
     return choice(tips).capitalize()
 
 
-def _tip_gen_astrology(db: Database, user: User) -> str:
+def _tip_gen_astrology(db: AsyncDatabase, user: User) -> str:
     """Фразы астрологизмы."""
     tips = [
         "Хмм отрицательная производная в фазе меркурия"
@@ -113,9 +104,9 @@ def _tip_gen_astrology(db: Database, user: User) -> str:
     return choice(tips).capitalize()
 
 
-def _tip_gen_lvl(db: Database, user: User) -> str:
+async def _tip_gen_lvl(db: AsyncDatabase, user: User) -> str:
     tip = "<b>Совет дня:</b> не програмируйте на PHP"
-    next_level = get_rule_level_by_level(db, user.level + 1)
+    next_level = await get_rule_level_by_level(db, user.level + 1)
     if next_level:
         left = next_level.exp_gte - user.total_exp
         tip = (
@@ -153,41 +144,43 @@ TIP_GENS = {
 }
 
 
-def tip_gen(
-    db: Database,
-    user: User,
-    expavg_score: float,
-    model,
-    tokenizer
-) -> UserTip:
+TIPS_BRANCHES = {
+    "hello": TIPS_HELLO,
+    "busy": TIPS_BUSY,
+    "lazy": TIPS_LAZY,
+}
+
+
+def tip_branch(user: User, expavg_score: float) -> str:
+    """Pick a kind of tip depending on user activity."""
     now = datetime.now(timezone.utc)
     onl = user.last_online
-    text = ''
+    if now.date() != onl.date():
+        return "hello"
+    if expavg_score > 0.5:
+        return "busy"
+    return "lazy"
 
-    while (
-        re.search(r'\w+', text) is None
-        or re.search(r'\d+', text) is not None
-    ):
-        if now.date() != onl.date():
-            text = _ask_model(
-                model,
-                tokenizer,
-                TIP_GENS[choice(TIPS_HELLO)](db, user)
-            )
-        elif expavg_score > 0.5:
-            text = _ask_model(
-                model,
-                tokenizer,
-                TIP_GENS[choice(TIPS_BUSY)](db, user)
-            )
 
-        else:
-            text = _ask_model(
-                model,
-                tokenizer,
-                TIP_GENS[choice(TIPS_LAZY)](db, user)
-            )
+def _tip_prompt(
+    db: AsyncDatabase,
+    user: User,
+    branch: str,
+) -> str:
+    """Pick a prompt for the tip of the given kind."""
+    return TIP_GENS[choice(TIPS_BRANCHES[branch])](db, user)
+
+
+def is_valid_tip(text: str) -> bool:
+    """Check that generated text can be shown as a tip."""
+    return (
+        re.search(r'\w+', text) is not None
+        and re.search(r'\d+', text) is None
+    )
+
 
+def _clean_tip(text: str) -> str:
+    """Trim generated text to full sentences and wrap it for html."""
     # for _ in range(10):
     #     text = text.replace("\n\n\n", "\n\n")
     text = text.strip(" \n")
@@ -212,8 +205,166 @@ def tip_gen(
     if len(text.split("\n")) > 2:
         text = "\n".join(text.split("\n")[:-1])
 
-    text = "<i>" + text.replace("\n", "<br>") + "</i>"
+    return "<i>" + text.replace("\n", "<br>") + "</i>"
 
-    return UserTip(
-        text=text
+
+async def _model_tip(
+    db: AsyncDatabase,
+    user: User,
+    branch: str,
+    prompt: str,
+    scheduler: BatchScheduler,
+    max_retries: int,
+    expires: Optional[float],
+) -> Tuple[str, str]:
+    """Generate a valid tip, return its text and the path taken."""
+    loop = asyncio.get_running_loop()
+    text = ''
+    attempts = 0
+    while not is_valid_tip(text):
+        if attempts > max_retries:
+            return prompt, "tip_fallback"
+        if attempts:
+            incr("tip_retry")
+            prompt = _tip_prompt(db, user, branch)
+        timeout = None
+        if expires is not None:
+            timeout = max(0.0, expires - loop.time())
+        try:
+            text = await asyncio.wait_for(
+                _ask_model(scheduler, prompt),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            return prompt, "tip_deadline"
+        except InferenceOverloaded:
+            return prompt, "tip_shed"
+        except InferenceClientError as detail:
+            log.warning(f"Tip generation failed: {detail!r}")
+            return prompt, "tip_error"
+        attempts += 1
+    return text, "tip_model"
+
+
+async def tip_gen(
+    db: AsyncDatabase,
+    user: User,
+    expavg_score: float,
+    scheduler: BatchScheduler,
+    pool: Optional[TextPool] = None,
+    max_retries: int = 3,
+    deadline: Optional[float] = None,
+    estimated_wait: Callable[[], float] = lambda: 0.0,
+    cache: Optional[TTLCache[UserTip]] = None,
+) -> UserTip:
+    """Generate a tip within deadline seconds.
+
+    A tip already shown to the user today for the same kind of activity
+    is repeated from cache. Otherwise pre-generated texts from pool are
+    used first, and when the model can not answer in time the
+    hand-written prompt phrase is shown instead.
+    """
+    branch = tip_branch(user, expavg_score)
+    key = (user.username, branch)
+    if cache is not None:
+        tip = cache.get(key)
+        if tip is not None:
+            incr("tip_cache")
+            return tip
+
+    text = ''
+    source = "tip_pool"
+    prompt = _tip_prompt(db, user, branch)
+    if pool is not None:
+        text = pool.pop(prompt) or ''
+    if not text:
+        if deadline is not None and estimated_wait() > deadline:
+            text, source = prompt, "tip_shed"
+        else:
+            expires = None
+            if deadline is not None:
+                expires = asyncio.get_running_loop().time() + deadline
+            text, source = await _model_tip(
+                db,
+                user,
+                branch,
+                prompt,
+                scheduler,
+                max_retries,
+                expires,
+            )
+    incr(source)
+
+    tip = UserTip(
+        text=_clean_tip(text)
+    )
+    # Template tips are a stopgap, let the next view try the model again.
+    if cache is not None and source in ("tip_pool", "tip_model"):
+        cache.set(key, tip)
+    return tip
+
+
+async def tip_stream(
+    db: AsyncDatabase,
+    user: User,
+    expavg_score: float,
+    stream: Callable[[str, Optional[float]], AsyncIterator[str]],
+    pool: Optional[TextPool] = None,
+    deadline: Optional[float] = None,
+    estimated_wait: Callable[[], float] = lambda: 0.0,
+    cache: Optional[TTLCache[UserTip]] = None,
+) -> AsyncIterator[Tuple[str, str]]:
+    """Generate a tip and yield ("token", text) pieces as they decode.
+
+    The last event is ("tip", html) with the same cleanup tip_gen
+    applies. Streamed text can not be taken back, so an invalid result
+    is replaced with the prompt phrase only in the final event; the
+    deadline applies to the whole stream.
+    """
+    branch = tip_branch(user, expavg_score)
+    key = (user.username, branch)
+    if cache is not None:
+        tip = cache.get(key)
+        if tip is not None:
+            incr("tip_cache")
+            yield "tip", tip.text
+            return
+
+    text = ''
+    source = "tip_pool"
+    streamed = False
+    prompt = _tip_prompt(db, user, branch)
+    if pool is not None:
+        text = pool.pop(prompt) or ''
+    if not text:
+        if deadline is not None and estimated_wait() > deadline:
+            text, source = prompt, "tip_shed"
+        else:
+            source = "tip_model"
+            expires = None
+            if deadline is not None:
+                expires = asyncio.get_running_loop().time() + deadline
+            try:
+                async for piece in stream(prompt, expires):
+                    text += piece
+                    streamed = True
+                    yield "token", piece
+            except asyncio.TimeoutError:
+                text, source = prompt, "tip_deadline"
+            except InferenceOverloaded:
+                text, source = prompt, "tip_shed"
+            except InferenceClientError as detail:
+                log.warning(f"Tip generation failed: {detail!r}")
+                text, source = prompt, "tip_error"
+            if not is_valid_tip(text):
+                text, source = prompt, "tip_fallback"
+    if not streamed:
+        yield "token", text
+    incr(source)
+
+    tip = UserTip(
+        text=_clean_tip(text)
     )
+    if cache is not None and source in ("tip_pool", "tip_model"):
+        cache.set(key, tip)
+    yield "tip", tip.text
@@ -1,22 +1,28 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
-from mongo import Database, ObjectId
+from pymongo import ReturnDocument
+
+from mongo import AsyncDatabase, ObjectId
 
 from models.users import User, UserFilled
 from models.objects import (
     ObjTable,
     ObjChair,
-    ObjMisc
+    ObjMisc,
+    ObjBase
 )
-from helpers.objects import get_obj_by_id, get_objs
+from helpers.objects import ObjCatalog, get_obj_catalog
+
+# How many recent purchase idempotency keys a user document keeps.
+PURCHASE_KEYS_KEPT = 32
 
 
-def get_user_by_username(
-    db: Database,
+async def get_user_by_username(
+    db: AsyncDatabase,
     username: str
 ) -> Optional[User]:
     """Get user by username."""
-    data = db[User.__colname__].find_one(
+    data = await db[User.__colname__].find_one(
         filter={"username": username}
     )
     if data is None:
@@ -24,50 +30,43 @@ def get_user_by_username(
     return User(**data)
 
 
-def create_user(
-    db: Database,
+async def create_user(
+    db: AsyncDatabase,
     user: User,
 ) -> ObjectId:
     """Create user."""
-    return db[User.__colname__].insert_one(
+    result = await db[User.__colname__].insert_one(
         document=user.dict()
-    ).inserted_id
+    )
+    user.clear_changes()
+    return result.inserted_id
 
 
-def fill_in_user(
-    db: Database,
+async def fill_in_user(
+    db: AsyncDatabase,
     user: User,
+    catalog: Optional[ObjCatalog] = None,
 ) -> UserFilled:
+    if catalog is None:
+        catalog = await get_obj_catalog(db)
     table_id = user.table
     chair_id = user.chair
     misc_ids = user.misc
-    table = get_obj_by_id(db, table_id, ObjTable)
+    table = catalog.get(table_id, ObjTable)
     if table is None:
         raise Exception(f"Table not found: {table_id}")
-    chair = get_obj_by_id(db, chair_id, ObjChair)
+    chair = catalog.get(chair_id, ObjChair)
     if chair is None:
         raise Exception(f"Chair not found: {chair_id}")
     misc: List[ObjMisc] = []
     for misc_id in misc_ids:
-        misc_rec = get_obj_by_id(db, misc_id, ObjMisc)
+        misc_rec = catalog.get(misc_id, ObjMisc)
         if misc_rec is None:
             raise Exception(f"Misc not found: {misc_id}")
         misc.append(misc_rec)
-    owned_tables = get_objs(
-        db,
-        {"id": {"$in": user.owned_tables}},
-        ObjTable
-    )
-    owned_chairs = get_objs(
-        db,
-        {"id": {"$in": user.owned_chairs}},
-        ObjChair
-    )
-    owned_misc = get_objs(
-        db,
-        {"id": {"$in": user.owned_misc}},
-        ObjMisc
-    )
+    owned_tables = catalog.get_many(user.owned_tables, ObjTable)
+    owned_chairs = catalog.get_many(user.owned_chairs, ObjChair)
+    owned_misc = catalog.get_many(user.owned_misc, ObjMisc)
 
     return UserFilled(
         username=user.username,
@@ -83,12 +82,70 @@ def fill_in_user(
     )
 
 
-def update_user(
-    db: Database,
+async def update_user(
+    db: AsyncDatabase,
     user: User,
 ) -> int:
-    """Create user."""
-    return db[User.__colname__].update_one(
+    """Save fields of user changed since load."""
+    update = user.get_update()
+    if not update:
+        return 0
+    result = await db[User.__colname__].update_one(
         filter={"username": user.username},
-        update={"$set": user.dict()},
-    ).modified_count
+        update=update,
+    )
+    user.clear_changes()
+    return result.modified_count
+
+
+async def purchase_obj(
+    db: AsyncDatabase,
+    username: str,
+    obj: ObjBase,
+    owned_field: str,
+    select: Dict[str, Dict[str, Any]],
+    idempotency_key: Optional[str] = None,
+) -> Optional[User]:
+    """Buy obj for user in one conditional update.
+
+    ``select`` is merged into the update to select obj after purchase.
+    A purchase already made with the same idempotency key is not
+    repeated, the user is returned as is. Return None when the user
+    does not exist, already owns obj or can not afford it.
+    """
+    filter: Dict[str, Any] = {
+        "username": username,
+        "total_money": {"$gte": obj.cost},
+        owned_field: {"$ne": obj.id},
+    }
+    update: Dict[str, Dict[str, Any]] = {
+        "$inc": {"total_money": -obj.cost},
+        "$addToSet": {owned_field: obj.id},
+    }
+    if idempotency_key is not None:
+        filter["purchase_keys"] = {"$ne": idempotency_key}
+        update["$push"] = {
+            "purchase_keys": {
+                "$each": [idempotency_key],
+                "$slice": -PURCHASE_KEYS_KEPT,
+            }
+        }
+    for operator, fields in select.items():
+        update.setdefault(operator, {}).update(fields)
+
+    collection = db[User.__colname__]
+    data = await collection.find_one_and_update(
+        filter=filter,
+        update=update,
+        return_document=ReturnDocument.AFTER
+    )
+    if data is not None:
+        return User(**data)
+    if idempotency_key is None:
+        return None
+    data = await collection.find_one(
+        filter={"username": username, "purchase_keys": idempotency_key}
+    )
+    if data is None:
+        return None
+    return User(**data)
@@ -0,0 +1,88 @@
+"""Store version stamp for in-process caches of store data."""
+import time
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+from pymongo import ReturnDocument
+
+from mongo import AsyncDatabase
+
+T = TypeVar("T")
+
+META_COLNAME = "meta"
+STORE_VERSION_ID = "store_version"
+
+# Bumps made by this process, so its own caches reload without waiting.
+_local_bumps = 0
+
+
+async def get_store_version(
+    db: AsyncDatabase,
+) -> int:
+    """Get current store version."""
+    data = await db[META_COLNAME].find_one(
+        filter={"_id": STORE_VERSION_ID}
+    )
+    if data is None:
+        return 0
+    return data["version"]
+
+
+async def bump_store_version(
+    db: AsyncDatabase,
+) -> int:
+    """Mark store data as changed, return the new version."""
+    global _local_bumps
+    data = await db[META_COLNAME].find_one_and_update(
+        filter={"_id": STORE_VERSION_ID},
+        update={"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _local_bumps += 1
+    return data["version"]
+
+
+class Versioned(Generic[T]):
+    """Value built from store data and rebuilt when the store version changes.
+
+    Other workers bump the version in mongo, so it is checked at most
+    every ``check_interval`` seconds; bumps made in this process are
+    seen right away. Concurrent reloads are harmless, the last one wins.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[AsyncDatabase], Awaitable[T]],
+        check_interval: float = 1.0,
+    ):
+        """Initialize the value."""
+        self.load = load
+        self.check_interval = check_interval
+        self._value: Optional[T] = None
+        self._version = -1
+        self._local_bumps = -1
+        self._checked = 0.0
+
+    async def get(self, db: AsyncDatabase) -> T:
+        """Return the value, reloading it if the store has changed."""
+        now = time.monotonic()
+        if (
+            self._value is not None
+            and self._local_bumps == _local_bumps
+            and now - self._checked < self.check_interval
+        ):
+            return self._value
+        local_bumps = _local_bumps
+        version = await get_store_version(db)
+        value = self._value
+        if value is None or version != self._version:
+            value = await self.load(db)
+            self._value = value
+            self._version = version
+        self._local_bumps = local_bumps
+        self._checked = now
+        return value
+
+    def invalidate(self) -> None:
+        """Reload the value on next access."""
+        self._value = None
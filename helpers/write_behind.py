@@ -0,0 +1,180 @@
+"""Write-behind buffer of user updates."""
+import asyncio
+import copy
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from mongo import AsyncDatabase
+from models.users import User
+
+log = logging.getLogger(__name__)
+
+Update = Dict[str, Dict[str, Any]]
+
+
+def merge_updates(first: Update, second: Update) -> Update:
+    """Combine two updates of a document into one with the same effect."""
+    merged = copy.deepcopy(first)
+    sets = merged.setdefault("$set", {})
+    incs = merged.setdefault("$inc", {})
+    for name, value in second.get("$set", {}).items():
+        sets[name] = value
+        incs.pop(name, None)
+    for name, value in second.get("$inc", {}).items():
+        if name in sets:
+            sets[name] += value
+        else:
+            incs[name] = incs.get(name, 0) + value
+    return {
+        operator: fields
+        for operator, fields in merged.items()
+        if fields
+    }
+
+
+def apply_update(data: Dict[str, Any], update: Update) -> Dict[str, Any]:
+    """Apply an update to a document the way mongo would."""
+    data = dict(data)
+    data.update(update.get("$set", {}))
+    for name, value in update.get("$inc", {}).items():
+        data[name] = data.get(name, 0) + value
+    return data
+
+
+class UserWriteBuffer:
+    """Merge pending user updates per username and write them in batches.
+
+    Updates are flushed every ``interval`` seconds, as soon as
+    ``max_pending`` users wait, and on stop. Pending updates live in
+    this worker only: readers here wait for ``settle`` before loading a
+    user and then apply ``overlay``.
+    """
+
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        max_pending: int,
+        interval: float,
+    ):
+        """Initialize the buffer."""
+        self.db = db
+        self.max_pending = max_pending
+        self.interval = interval
+        self._pending: Dict[str, Update] = {}
+        # Updates taken by a flush that has not finished yet.
+        self._flushing: Dict[str, Update] = {}
+        # Set when the running flush finishes, created inside the loop.
+        self._flushed: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, user: User) -> None:
+        """Queue changes of user and mark it saved."""
+        update = user.get_update()
+        if not update:
+            return
+        pending = self._pending.get(user.username, {})
+        self._pending[user.username] = merge_updates(pending, update)
+        user.clear_changes()
+        if len(self._pending) >= self.max_pending and not self._flushing:
+            asyncio.ensure_future(self._try_flush())
+
+    async def settle(self, username: str) -> None:
+        """Wait until a running flush has written updates of username."""
+        while username in self._flushing and self._flushed is not None:
+            await self._flushed.wait()
+
+    def overlay(self, user: User) -> User:
+        """Return user with its pending updates applied."""
+        update = self._pending.get(user.username)
+        if update is None:
+            return user
+        return User(**apply_update(user.dict(), update))
+
+    async def flush(self) -> int:
+        """Write all pending updates, return the number of modified users.
+
+        A running flush is waited for first, so nothing is left pending.
+        """
+        while self._flushing and self._flushed is not None:
+            await self._flushed.wait()
+        if not self._pending:
+            return 0
+        self._flushing, self._pending = self._pending, {}
+        self._flushed = asyncio.Event()
+        usernames = list(self._flushing)
+        try:
+            result = await self.db[User.__colname__].bulk_write(
+                [
+                    UpdateOne({"username": username}, self._flushing[username])
+                    for username in usernames
+                ],
+                ordered=False
+            )
+        except BulkWriteError as error:
+            # Failed writes were not applied, retry them whole.
+            self._requeue([
+                usernames[write_error["index"]]
+                for write_error in error.details["writeErrors"]
+            ])
+            raise
+        except BaseException:
+            # The writes may have been applied: retrying $inc would
+            # count money and exp twice, retrying $set is harmless.
+            self._requeue(usernames, sets_only=True)
+            raise
+        finally:
+            self._flushing = {}
+            self._flushed.set()
+        return result.modified_count
+
+    def _requeue(self, usernames: List[str], sets_only: bool = False) -> None:
+        """Put updates of a failed flush before the ones queued since."""
+        for username in usernames:
+            update = self._flushing[username]
+            if sets_only and "$inc" in update:
+                log.error(
+                    f"Dropped user writes of unknown outcome: "
+                    f"{username} {update['$inc']}"
+                )
+                update = {"$set": update.get("$set", {})}
+            update = merge_updates(update, self._pending.get(username, {}))
+            if update:
+                self._pending[username] = update
+
+    async def _try_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception as detail:
+            log.warning(f"User writes flush failed: {detail!r}")
+
+    async def run(self) -> None:
+        """Flush pending updates in the background until stopped."""
+        assert self._stopping is not None
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self._try_flush()
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write what is pending.
+
+        The task is not cancelled, so a flush in progress completes.
+        """
+        if self._task is not None:
+            assert self._stopping is not None
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
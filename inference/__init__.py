@@ -0,0 +1,13 @@
+"""Model inference."""
+
+# flake8: noqa
+from inference.config import InferenceConfig
+from inference.registry import get_model, is_model_loaded
+from inference.prompt_cache import PromptCache
+from inference.generate import WARMUP_PROMPT, generate_texts
+from inference.stream import stream_text
+from inference.batcher import BatchScheduler
+from inference.executor import InferenceExecutor, InferenceOverloaded
+from inference.pool import TextPool
+from inference.runtime import configure_runtime, configure_threads
+from inference.client import RemoteGenerator, InferenceClientError
@@ -0,0 +1,67 @@
+"""Micro-batching inference scheduler."""
+import asyncio
+from logging import getLogger
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+log = getLogger(__name__)
+
+GenerateFn = Callable[[List[str]], Awaitable[List[str]]]
+
+
+class BatchScheduler:
+    """Collect concurrent prompts and generate them in batches.
+
+    Prompts submitted within ``batch_window`` seconds of each other (or
+    until ``max_batch_size`` prompts are waiting) are generated with a
+    single awaited call to ``generate`` and each result is handed back to its
+    waiting caller.
+    """
+
+    def __init__(
+        self,
+        generate: GenerateFn,
+        max_batch_size: int = 8,
+        batch_window: float = 0.02,
+    ):
+        """Initialize the scheduler."""
+        self.generate = generate
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, prompt: str) -> str:
+        """Queue prompt for the next batch and wait for its text."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send pending prompts off as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Generate texts for batch and resolve waiting futures."""
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            texts = await self.generate(prompts)
+        except Exception as detail:
+            log.warning(f"Batch generation failed: {detail!r}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(detail)
+            return
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
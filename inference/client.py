@@ -0,0 +1,70 @@
+"""Client of shared inference workers."""
+import itertools
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Dict, List, Optional
+
+
+class InferenceClientError(Exception):
+    """Raised when no inference worker could generate texts."""
+
+
+class RemoteGenerator:
+    """Send generate requests to inference worker processes.
+
+    Requests are spread round-robin over worker addresses; a worker
+    that can not be reached is skipped in favour of the next one. Each
+    thread keeps its own connections since they are not thread-safe.
+    """
+
+    def __init__(self, addresses: List[str], authkey: bytes):
+        """Initialize the client."""
+        if not addresses:
+            raise ValueError("At least one worker address is required")
+        if not authkey:
+            raise ValueError("Worker authkey is required")
+        self.addresses = addresses
+        self.authkey = authkey
+        self._local = threading.local()
+        self._counter = itertools.count()
+
+    def _connections(self) -> Dict[str, Connection]:
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = {}
+            self._local.connections = connections
+        return connections
+
+    def _connect(self, address: str) -> Connection:
+        connections = self._connections()
+        conn = connections.get(address)
+        if conn is None:
+            conn = Client(address, family="AF_UNIX", authkey=self.authkey)
+            connections[address] = conn
+        return conn
+
+    def _drop(self, address: str) -> None:
+        conn = self._connections().pop(address, None)
+        if conn is not None:
+            conn.close()
+
+    def generate(self, queries: List[str]) -> List[str]:
+        """Generate texts for prompts on one of the workers."""
+        start = next(self._counter)
+        last_error: Optional[BaseException] = None
+        for shift in range(len(self.addresses)):
+            address = self.addresses[(start + shift) % len(self.addresses)]
+            try:
+                conn = self._connect(address)
+                conn.send(("generate", queries))
+                status, payload = conn.recv()
+            except (OSError, EOFError) as detail:
+                self._drop(address)
+                last_error = detail
+                continue
+            if status != "ok":
+                raise InferenceClientError(payload)
+            return payload
+        raise InferenceClientError(
+            f"No inference worker available: {last_error!r}"
+        )
@@ -0,0 +1,48 @@
+"""Inference config."""
+from pydantic import BaseModel, validator
+
+from inference.precision import PRECISIONS
+
+
+class InferenceConfig(BaseModel):
+    """Config for text generation model."""
+
+    model_name: str = "sberbank-ai/rugpt3medium_based_on_gpt2"
+    precision: str = "fp32"
+    weights_path: str = ""
+    preload: bool = False
+
+    torch_threads: int = 0
+    torch_interop_threads: int = 0
+    cpu_affinity: str = ""
+    warmup: bool = True
+
+    worker_addresses: str = ""
+    # Required with worker_addresses, shared by the app and its workers.
+    worker_authkey: str = ""
+
+    batch_max_size: int = 8
+    batch_window_ms: int = 20
+    prompt_cache_size: int = 32
+
+    slots: int = 1
+    max_queue_depth: int = 16
+
+    pool_low_watermark: int = 2
+    pool_high_watermark: int = 8
+    pool_max_prompts: int = 64
+    pool_interval_ms: int = 500
+
+    @validator("precision")
+    def check_precision(cls, value: str) -> str:
+        """Check that precision is a supported mode."""
+        if value not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}")
+        return value
+
+    @validator("worker_authkey", always=True)
+    def check_worker_authkey(cls, value: str, values: dict) -> str:
+        """Require an authkey when inference workers are used."""
+        if values.get("worker_addresses") and not value:
+            raise ValueError("worker_authkey is required with workers")
+        return value
@@ -0,0 +1,53 @@
+"""Decoding constraints."""
+import re
+from functools import lru_cache
+from typing import List
+
+import torch
+from transformers import (
+    GPT2Tokenizer,
+    LogitsProcessor,
+    LogitsProcessorList,
+    NoBadWordsLogitsProcessor
+)
+
+BAD_WORDS = ["секс"]
+
+
+class BanTokensLogitsProcessor(LogitsProcessor):
+    """Never sample any of the given tokens."""
+
+    def __init__(self, token_ids: List[int]):
+        """Initialize the processor."""
+        self.token_ids = torch.tensor(token_ids, dtype=torch.long)
+
+    def __call__(
+        self,
+        input_ids: torch.LongTensor,
+        scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        """Mask banned tokens out of the next-token scores."""
+        scores[:, self.token_ids] = -float("inf")
+        return scores
+
+
+def digit_token_ids(tokenizer: GPT2Tokenizer) -> List[int]:
+    """Return ids of all tokens that decode to text with a digit."""
+    return [
+        token_id
+        for token, token_id in tokenizer.get_vocab().items()
+        if re.search(r'\d', tokenizer.convert_tokens_to_string([token]))
+    ]
+
+
+@lru_cache(maxsize=None)
+def tip_logits_processors(tokenizer: GPT2Tokenizer) -> LogitsProcessorList:
+    """Build processors that keep digits and bad words out of tips."""
+    encoded_bad = [
+        tokenizer.encode(word, add_prefix_space=True)
+        for word in BAD_WORDS
+    ]
+    return LogitsProcessorList([
+        BanTokensLogitsProcessor(digit_token_ids(tokenizer)),
+        NoBadWordsLogitsProcessor(encoded_bad, tokenizer.eos_token_id),
+    ])
@@ -0,0 +1,140 @@
+"""Bounded executor for model inference."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class InferenceOverloaded(Exception):
+    """Raised when too many inference jobs are already waiting."""
+
+
+class InferenceExecutor:
+    """Run blocking inference jobs off the event loop.
+
+    At most ``slots`` jobs run at once and at most ``max_queue_depth``
+    more may wait for a free slot; anything beyond that is rejected with
+    ``InferenceOverloaded`` instead of piling up behind the model.
+    Job durations are averaged to estimate how long a new job would
+    take to finish, which callers use to shed load before queuing.
+    """
+
+    def __init__(
+        self,
+        slots: int = 1,
+        max_queue_depth: int = 16,
+        smoothing: float = 0.2,
+    ):
+        """Initialize the executor."""
+        self.slots = max(1, slots)
+        self.max_queue_depth = max(0, max_queue_depth)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.slots,
+            thread_name_prefix="inference"
+        )
+        self._in_flight = 0
+        self.smoothing = smoothing
+        self._avg_seconds: Optional[float] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a free slot."""
+        return max(0, self._in_flight - self.slots)
+
+    @property
+    def is_idle(self) -> bool:
+        """Check whether no job is running or waiting."""
+        return self._in_flight == 0
+
+    @property
+    def is_full(self) -> bool:
+        """Check whether a new job would be rejected."""
+        return self._in_flight >= self.slots + self.max_queue_depth
+
+    def estimated_wait(self) -> float:
+        """Expected seconds until a job submitted now is finished."""
+        if self._avg_seconds is None:
+            return 0.0
+        return self._avg_seconds * (self._in_flight // self.slots + 1)
+
+    def _timed(self, fn: Callable[..., T], *args: Any) -> T:
+        """Call fn(*args) and fold its duration into the average."""
+        started = time.perf_counter()
+        result = fn(*args)
+        seconds = time.perf_counter() - started
+        if self._avg_seconds is None:
+            self._avg_seconds = seconds
+        else:
+            self._avg_seconds += self.smoothing * (
+                seconds - self._avg_seconds
+            )
+        return result
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(*args) in the executor and wait for the result."""
+        if self.is_full:
+            raise InferenceOverloaded(
+                f"Inference queue is full ({self.max_queue_depth})"
+            )
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool,
+                self._timed,
+                fn,
+                *args
+            )
+        finally:
+            self._in_flight -= 1
+
+    async def iterate(
+        self,
+        fn: Callable[..., Iterator[T]],
+        *args: Any,
+        expires: Optional[float] = None,
+    ) -> AsyncIterator[T]:
+        """Run iterator fn(*args) in the executor and yield its items.
+
+        Waiting for an item past ``expires`` (event loop time) raises
+        ``asyncio.TimeoutError``.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+        done = object()
+
+        def produce() -> None:
+            for item in fn(*args):
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def finished(job: asyncio.Future) -> None:
+            queue.put_nowait(done)
+            # Nobody may await the job once the consumer has gone.
+            if not job.cancelled():
+                job.exception()
+
+        job = asyncio.ensure_future(self.run(produce))
+        job.add_done_callback(finished)
+        try:
+            while True:
+                timeout = None
+                if expires is not None:
+                    timeout = max(0.0, expires - loop.time())
+                item = await asyncio.wait_for(queue.get(), timeout)
+                if item is done:
+                    break
+                yield item
+            await job
+        finally:
+            # The client went away, do not keep generating for nobody.
+            stopped.set()
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs and wait for running ones."""
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,121 @@
+"""Batched text generation."""
+from typing import Dict, List, Optional
+
+import torch
+from transformers import (
+    GPT2LMHeadModel,
+    GPT2Tokenizer,
+    LogitsProcessorList,
+    StoppingCriteriaList
+)
+
+from inference.constraints import tip_logits_processors
+from inference.prompt_cache import CachedPrompt, PromptCache, stack_prompts
+from inference.stopping import (
+    MinSentencesLogitsProcessor,
+    SentenceBoundary,
+    SentenceStoppingCriteria
+)
+
+WARMUP_PROMPT = "Здравствуй!"
+
+GENERATE_KWARGS = dict(
+    max_length=40,
+    top_k=5,
+    top_p=0.95,
+    do_sample=True,
+)
+
+
+def _decoding_kwargs(tokenizer: GPT2Tokenizer, prompt_length: int) -> dict:
+    """Constraints and sentence-based stopping for a generate call."""
+    boundary = SentenceBoundary(tokenizer, prompt_length)
+    return dict(
+        logits_processor=LogitsProcessorList([
+            *tip_logits_processors(tokenizer),
+            MinSentencesLogitsProcessor(boundary, tokenizer.eos_token_id),
+        ]),
+        stopping_criteria=StoppingCriteriaList([
+            SentenceStoppingCriteria(boundary),
+        ]),
+    )
+
+
+def _decode(
+    tokenizer: GPT2Tokenizer,
+    output_sequences: torch.Tensor
+) -> List[str]:
+    return [
+        str(text)
+        for text in tokenizer.batch_decode(
+            output_sequences,
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=True
+        )
+    ]
+
+
+def _generate_cached(
+    model: GPT2LMHeadModel,
+    tokenizer: GPT2Tokenizer,
+    queries: List[str],
+    prompt_cache: PromptCache,
+) -> List[str]:
+    """Generate texts starting from cached prompt prefixes.
+
+    The whole batch is one generate call: cached prefixes of different
+    prompts are left-padded together, so prompts are neither encoded nor
+    prefilled again.
+    """
+    cached: Dict[str, CachedPrompt] = {}
+    for query in queries:
+        if query not in cached:
+            cached[query] = prompt_cache.get(model, tokenizer, query)
+    input_ids, attention_mask, past = stack_prompts(
+        [cached[query] for query in queries],
+        tokenizer.pad_token_id
+    )
+    output_sequences = model.generate(
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        past=past,
+        pad_token_id=tokenizer.pad_token_id,
+        **_decoding_kwargs(tokenizer, input_ids.shape[-1]),
+        **GENERATE_KWARGS,
+    )
+    return _decode(tokenizer, output_sequences)
+
+
+def _generate_padded(
+    model: GPT2LMHeadModel,
+    tokenizer: GPT2Tokenizer,
+    queries: List[str],
+) -> List[str]:
+    """Generate texts for left-padded prompts."""
+    encoded = tokenizer(
+        queries,
+        add_special_tokens=False,
+        padding=True,
+        return_tensors='pt'
+    )
+    output_sequences = model.generate(
+        input_ids=encoded["input_ids"],
+        attention_mask=encoded["attention_mask"],
+        pad_token_id=tokenizer.pad_token_id,
+        **_decoding_kwargs(tokenizer, encoded["input_ids"].shape[-1]),
+        **GENERATE_KWARGS,
+    )
+    return _decode(tokenizer, output_sequences)
+
+
+def generate_texts(
+    model: GPT2LMHeadModel,
+    tokenizer: GPT2Tokenizer,
+    queries: List[str],
+    prompt_cache: Optional[PromptCache] = None,
+) -> List[str]:
+    """Generate continuations for a batch of prompts in one pass."""
+    with torch.inference_mode():
+        if prompt_cache is not None:
+            return _generate_cached(model, tokenizer, queries, prompt_cache)
+        return _generate_padded(model, tokenizer, queries)
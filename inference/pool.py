@@ -0,0 +1,117 @@
+"""Background pool of pre-generated texts."""
+import asyncio
+from collections import OrderedDict, deque
+from logging import getLogger
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+from inference.batcher import GenerateFn
+
+log = getLogger(__name__)
+
+
+class TextPool:
+    """Keep a bounded pool of validated generated texts per prompt.
+
+    A background task refills every known prompt whose pool dropped
+    below ``low_watermark`` until it holds ``high_watermark`` texts,
+    but only while ``is_idle`` reports that no live request is waiting
+    for the model. Prompts become known on their first ``pop``; at most
+    ``max_prompts`` most recently used ones are kept.
+    """
+
+    def __init__(
+        self,
+        generate: GenerateFn,
+        is_valid: Callable[[str], bool],
+        is_idle: Callable[[], bool],
+        low_watermark: int = 2,
+        high_watermark: int = 8,
+        max_prompts: int = 64,
+        batch_size: int = 8,
+        interval: float = 0.5,
+    ):
+        """Initialize the pool."""
+        self.generate = generate
+        self.is_valid = is_valid
+        self.is_idle = is_idle
+        self.low_watermark = low_watermark
+        self.high_watermark = max(low_watermark, high_watermark)
+        self.max_prompts = max_prompts
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self._pools: Dict[str, Deque[str]] = OrderedDict()
+        self._refilling: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def pop(self, prompt: str) -> Optional[str]:
+        """Take a ready text for prompt, if there is one."""
+        pool = self._pools.get(prompt)
+        if pool is None:
+            pool = deque(maxlen=self.high_watermark)
+            self._pools[prompt] = pool
+            while len(self._pools) > self.max_prompts:
+                stale, _ = self._pools.popitem(last=False)
+                self._refilling.discard(stale)
+        else:
+            self._pools.move_to_end(prompt)  # type: ignore
+        if not pool:
+            return None
+        return pool.popleft()
+
+    def _prompts_to_refill(self) -> List[str]:
+        """Return one prompt per missing text, at most a batch."""
+        prompts: List[str] = []
+        for prompt, pool in self._pools.items():
+            if len(pool) < self.low_watermark:
+                self._refilling.add(prompt)
+            if prompt not in self._refilling:
+                continue
+            missing = self.high_watermark - len(pool)
+            if missing <= 0:
+                self._refilling.discard(prompt)
+                continue
+            prompts.extend(
+                [prompt] * min(missing, self.batch_size - len(prompts))
+            )
+            if len(prompts) >= self.batch_size:
+                break
+        return prompts
+
+    async def refill(self) -> int:
+        """Generate one batch of texts for pools below the watermark."""
+        prompts = self._prompts_to_refill()
+        if not prompts:
+            return 0
+        texts = await self.generate(prompts)
+        added = 0
+        for prompt, text in zip(prompts, texts):
+            pool = self._pools.get(prompt)
+            if pool is None or not self.is_valid(text):
+                continue
+            pool.append(text)
+            added += 1
+        return added
+
+    async def run(self) -> None:
+        """Refill pools in the background while the model is idle."""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.is_idle():
+                continue
+            try:
+                await self.refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as detail:
+                log.warning(f"Pool refill failed: {detail!r}")
+
+    def start(self) -> None:
+        """Start the background refill task."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+
+    def stop(self) -> None:
+        """Stop the background refill task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
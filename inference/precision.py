@@ -0,0 +1,63 @@
+"""Reduced-precision CPU inference."""
+from logging import getLogger
+
+import torch
+from transformers import GPT2LMHeadModel
+from transformers.pytorch_utils import Conv1D
+
+log = getLogger(__name__)
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+def cpu_supports_bf16() -> bool:
+    """Check whether the CPU has native bf16 instructions."""
+    try:
+        with open("/proc/cpuinfo") as file:
+            flags = file.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def _conv1d_to_linear(module: torch.nn.Module) -> None:
+    """Replace GPT-2 Conv1D layers with equivalent Linear layers.
+
+    GPT-2 projections are Conv1D modules, which dynamic quantization
+    does not know about; Linear computes the same x @ W + b.
+    """
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            n_in, n_out = child.weight.shape
+            linear = torch.nn.Linear(n_in, n_out)
+            linear.weight = torch.nn.Parameter(
+                child.weight.detach().t().contiguous()
+            )
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+
+def apply_precision(
+    model: GPT2LMHeadModel,
+    precision: str
+) -> GPT2LMHeadModel:
+    """Convert model weights to the requested inference precision."""
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r}, expected one of {PRECISIONS}"
+        )
+    if precision == "int8":
+        _conv1d_to_linear(model)
+        return torch.quantization.quantize_dynamic(
+            model,
+            {torch.nn.Linear},
+            dtype=torch.qint8
+        )
+    if precision == "bf16":
+        if not cpu_supports_bf16():
+            log.warning("CPU has no native bf16 support, using fp32")
+            return model
+        return model.to(torch.bfloat16)
+    return model
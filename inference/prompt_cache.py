@@ -0,0 +1,156 @@
+"""Cache of encoded prompts and their attention prefixes."""
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from transformers import (
+    GPT2LMHeadModel,
+    GPT2Tokenizer
+)
+
+PastKeyValues = Tuple[Tuple[torch.Tensor, ...], ...]
+
+
+class CachedPrompt:
+    """Prompt token ids and past key values of all but the last token."""
+
+    def __init__(
+        self,
+        input_ids: torch.Tensor,
+        past: Optional[PastKeyValues],
+    ):
+        """Initialize the cached prompt."""
+        self.input_ids = input_ids
+        self.past = past
+
+    def expand(
+        self,
+        size: int
+    ) -> Tuple[torch.Tensor, Optional[PastKeyValues]]:
+        """Return ids and past repeated for a batch of size rows."""
+        input_ids = self.input_ids.expand(size, -1)
+        if self.past is None:
+            return input_ids, None
+        past = tuple(
+            tuple(tensor.expand(size, -1, -1, -1) for tensor in layer)
+            for layer in self.past
+        )
+        return input_ids, past
+
+
+def stack_prompts(
+    prompts: List[CachedPrompt],
+    pad_token_id: int,
+) -> Tuple[torch.Tensor, torch.Tensor, Optional[PastKeyValues]]:
+    """Left-pad cached prompts into one batch.
+
+    Return ids, attention mask and past of the rows. Padded positions of
+    the past are zeros hidden by the mask; GPT-2 takes position ids from
+    the mask, so every row sees the positions its prefix was built with.
+    """
+    first = prompts[0]
+    if all(prompt is first for prompt in prompts):
+        input_ids, past = first.expand(len(prompts))
+        return input_ids, torch.ones_like(input_ids), past
+
+    length = max(prompt.input_ids.shape[-1] for prompt in prompts)
+    input_ids = torch.cat([
+        F.pad(
+            prompt.input_ids,
+            (length - prompt.input_ids.shape[-1], 0),
+            value=pad_token_id
+        )
+        for prompt in prompts
+    ])
+    attention_mask = torch.cat([
+        F.pad(
+            torch.ones_like(prompt.input_ids),
+            (length - prompt.input_ids.shape[-1], 0),
+            value=0
+        )
+        for prompt in prompts
+    ])
+    template = next(
+        (prompt.past for prompt in prompts if prompt.past is not None),
+        None
+    )
+    if template is None:
+        return input_ids, attention_mask, None
+
+    def pad_past(
+        prompt: CachedPrompt,
+        layer: int,
+        index: int
+    ) -> torch.Tensor:
+        if prompt.past is None:
+            shape = list(template[layer][index].shape)
+            shape[-2] = length - 1
+            return template[layer][index].new_zeros(shape)
+        tensor = prompt.past[layer][index]
+        return F.pad(tensor, (0, 0, length - 1 - tensor.shape[-2], 0))
+
+    past = tuple(
+        tuple(
+            torch.cat([
+                pad_past(prompt, layer, index)
+                for prompt in prompts
+            ])
+            for index in range(len(template[layer]))
+        )
+        for layer in range(len(template))
+    )
+    return input_ids, attention_mask, past
+
+
+class PromptCache:
+    """Bounded LRU cache of prompt prefixes for a single model.
+
+    The fixed tip prompts are encoded and run through the transformer
+    once; generation then starts from the cached prefix and only has to
+    feed the last prompt token before sampling.
+    """
+
+    def __init__(self, max_size: int = 32):
+        """Initialize the cache."""
+        self.max_size = max_size
+        self._prompts: "OrderedDict[str, CachedPrompt]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model: GPT2LMHeadModel,
+        tokenizer: GPT2Tokenizer,
+        prompt: str,
+    ) -> CachedPrompt:
+        """Return cached prefix for prompt, computing it on first use."""
+        with self._lock:
+            cached = self._prompts.get(prompt)
+            if cached is not None:
+                self._prompts.move_to_end(prompt)
+                return cached
+        cached = self._encode(model, tokenizer, prompt)
+        with self._lock:
+            self._prompts[prompt] = cached
+            while len(self._prompts) > self.max_size:
+                self._prompts.popitem(last=False)
+        return cached
+
+    @staticmethod
+    def _encode(
+        model: GPT2LMHeadModel,
+        tokenizer: GPT2Tokenizer,
+        prompt: str,
+    ) -> CachedPrompt:
+        """Encode prompt and compute past key values of its prefix."""
+        input_ids = tokenizer.encode(
+            prompt,
+            add_special_tokens=False,
+            return_tensors='pt'
+        )
+        if input_ids.shape[-1] < 2:
+            return CachedPrompt(input_ids, None)
+        with torch.inference_mode():
+            outputs = model(input_ids[:, :-1], use_cache=True)
+        return CachedPrompt(input_ids, outputs.past_key_values)
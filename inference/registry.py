@@ -0,0 +1,66 @@
+"""Process-wide model registry."""
+import threading
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Tuple
+
+import torch
+from transformers import (
+    GPT2LMHeadModel,
+    GPT2Tokenizer
+)
+
+from inference.config import InferenceConfig
+from inference.precision import apply_precision
+from inference.weights import load_mmap_model
+
+log = getLogger(__name__)
+
+ModelPair = Tuple[GPT2LMHeadModel, GPT2Tokenizer]
+
+_lock = threading.Lock()
+_models: Dict[tuple, ModelPair] = {}
+
+
+def _model_key(config: InferenceConfig) -> tuple:
+    """Return registry key for the model described by config."""
+    return (config.model_name, config.weights_path, config.precision)
+
+
+def _load_model(config: InferenceConfig) -> ModelPair:
+    """Load model and tokenizer from pretrained or mmap'ed weights."""
+    device = torch.device("cpu")
+    if config.weights_path:
+        model, tokenizer = load_mmap_model(Path(config.weights_path))
+    else:
+        tokenizer = GPT2Tokenizer.from_pretrained(config.model_name)
+        model = GPT2LMHeadModel.from_pretrained(config.model_name)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    model.to(device)
+    model.eval()
+    model = apply_precision(model, config.precision)
+    return model, tokenizer
+
+
+def get_model(config: InferenceConfig) -> ModelPair:
+    """Return shared model and tokenizer, loading them on first use."""
+    key = _model_key(config)
+    pair = _models.get(key)
+    if pair is not None:
+        return pair
+    with _lock:
+        pair = _models.get(key)
+        if pair is None:
+            log.info(
+                f"Loading model {config.model_name} ({config.precision})"
+            )
+            pair = _load_model(config)
+            _models[key] = pair
+    return pair
+
+
+def is_model_loaded(config: InferenceConfig) -> bool:
+    """Check whether the model is already loaded in this process."""
+    return _model_key(config) in _models
@@ -0,0 +1,98 @@
+"""Torch runtime tuning."""
+import fcntl
+import os
+import tempfile
+from logging import getLogger
+from typing import IO, List, Optional, Set
+
+import torch
+
+from inference.config import InferenceConfig
+
+log = getLogger(__name__)
+
+_held_locks: List[IO] = []
+
+# Set once per process; forked workers inherit it from the master.
+_interop_threads_set = False
+
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """Parse cpu list like ``0-3,6`` into a set of cpu numbers."""
+    cpus: Set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def claim_cpu_set(spec: str) -> Optional[Set[int]]:
+    """Claim the first cpu set from spec not taken by another worker.
+
+    Spec lists one cpu set per worker separated by ``;``, for example
+    ``0-3;4-7``. Workers do not know their index, so each one takes an
+    exclusive lock file per set and keeps it for the process lifetime.
+    """
+    cpu_sets = [parse_cpu_list(part) for part in spec.split(";")]
+    for index, cpus in enumerate(cpu_sets):
+        if not cpus:
+            continue
+        path = os.path.join(
+            tempfile.gettempdir(),
+            f"gimmefy-cpu-set-{index}.lock"
+        )
+        lock = open(path, "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            continue
+        _held_locks.append(lock)
+        return cpus
+    return None
+
+
+def configure_threads(config: InferenceConfig, threads: int = 0) -> None:
+    """Size torch thread pools.
+
+    Inter-op threads can only be set before the first torch operation,
+    so with preload this runs in the master before the model is loaded.
+    """
+    global _interop_threads_set
+    threads = threads or config.torch_threads
+    if threads:
+        torch.set_num_threads(threads)
+    if config.torch_interop_threads and not _interop_threads_set:
+        try:
+            torch.set_num_interop_threads(config.torch_interop_threads)
+        except RuntimeError as detail:
+            log.warning(f"Can not set inter-op threads: {detail}")
+        _interop_threads_set = True
+    log.info(
+        f"Torch threads: intra-op {torch.get_num_threads()}, "
+        f"inter-op {torch.get_num_interop_threads()}"
+    )
+
+
+def configure_runtime(config: InferenceConfig) -> None:
+    """Pin the worker to its cpu set and size torch thread pools.
+
+    Must run in each worker after fork and, without preload, before the
+    first torch operation in the process.
+    """
+    threads = config.torch_threads
+    if config.cpu_affinity:
+        cpus = claim_cpu_set(config.cpu_affinity)
+        if cpus is None:
+            log.warning("No free cpu set left, affinity is not changed")
+        else:
+            os.sched_setaffinity(0, cpus)
+            threads = threads or len(cpus)
+            log.info(f"Pinned worker {os.getpid()} to cpus {sorted(cpus)}")
+    configure_threads(config, threads)
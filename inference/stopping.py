@@ -0,0 +1,83 @@
+"""Stop generation at sentence boundaries."""
+import re
+
+import torch
+from transformers import (
+    GPT2Tokenizer,
+    LogitsProcessor,
+    StoppingCriteria
+)
+
+SENTENCE_END = re.compile(r'[.!?…]+')
+
+MIN_SENTENCES = 1
+MIN_SENTENCE_WORDS = 3
+
+
+def count_sentences(text: str, min_words: int = MIN_SENTENCE_WORDS) -> int:
+    """Count complete sentences of at least min_words words in text."""
+    parts = SENTENCE_END.split(text)
+    # The last part is whatever follows the last sentence end.
+    return sum(1 for part in parts[:-1] if len(part.split()) >= min_words)
+
+
+class SentenceBoundary:
+    """Tell whether generated text already has enough full sentences."""
+
+    def __init__(
+        self,
+        tokenizer: GPT2Tokenizer,
+        prompt_length: int,
+        min_sentences: int = MIN_SENTENCES,
+        min_words: int = MIN_SENTENCE_WORDS,
+    ):
+        """Initialize the checker."""
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.min_sentences = min_sentences
+        self.min_words = min_words
+
+    def is_done(self, row: torch.Tensor) -> bool:
+        """Check a single sequence of token ids, prompt included."""
+        text = self.tokenizer.decode(
+            row[self.prompt_length:],
+            skip_special_tokens=True
+        )
+        return count_sentences(text, self.min_words) >= self.min_sentences
+
+
+class MinSentencesLogitsProcessor(LogitsProcessor):
+    """Forbid end of text until a row has enough full sentences."""
+
+    def __init__(self, boundary: SentenceBoundary, eos_token_id: int):
+        """Initialize the processor."""
+        self.boundary = boundary
+        self.eos_token_id = eos_token_id
+
+    def __call__(
+        self,
+        input_ids: torch.LongTensor,
+        scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        """Mask end of text for rows that are not done yet."""
+        for index, row in enumerate(input_ids):
+            if not self.boundary.is_done(row):
+                scores[index, self.eos_token_id] = -float("inf")
+        return scores
+
+
+class SentenceStoppingCriteria(StoppingCriteria):
+    """Stop once every row ends with enough full sentences."""
+
+    def __init__(self, boundary: SentenceBoundary):
+        """Initialize the criteria."""
+        self.boundary = boundary
+
+    def __call__(
+        self,
+        input_ids: torch.LongTensor,
+        scores: torch.FloatTensor,
+        **kwargs
+    ) -> bool:
+        """Check whether generation can stop."""
+        return all(self.boundary.is_done(row) for row in input_ids)
@@ -0,0 +1,87 @@
+"""Token-by-token text generation."""
+from typing import Iterator, Optional
+
+import torch
+from transformers import (
+    GPT2LMHeadModel,
+    GPT2Tokenizer,
+    LogitsProcessorList,
+    TopKLogitsWarper,
+    TopPLogitsWarper
+)
+
+from inference.constraints import tip_logits_processors
+from inference.generate import GENERATE_KWARGS
+from inference.prompt_cache import PromptCache
+from inference.stopping import SentenceBoundary
+
+
+def stream_text(
+    model: GPT2LMHeadModel,
+    tokenizer: GPT2Tokenizer,
+    prompt: str,
+    prompt_cache: Optional[PromptCache] = None,
+) -> Iterator[str]:
+    """Sample a continuation of prompt and yield text as it is decoded.
+
+    Uses the same sampling settings, constraints and sentence-based
+    stopping as generate_texts.
+    The first piece contains the prompt itself, so joined pieces equal
+    the text generate_texts would return.
+    """
+    max_length = GENERATE_KWARGS["max_length"]
+    processors = tip_logits_processors(tokenizer)
+    warpers = LogitsProcessorList([
+        TopKLogitsWarper(top_k=GENERATE_KWARGS["top_k"]),
+        TopPLogitsWarper(top_p=GENERATE_KWARGS["top_p"]),
+    ])
+    eos_token_id = tokenizer.eos_token_id
+
+    with torch.inference_mode():
+        if prompt_cache is not None:
+            input_ids, past = prompt_cache.get(
+                model,
+                tokenizer,
+                prompt
+            ).expand(1)
+        else:
+            input_ids = tokenizer.encode(
+                prompt,
+                add_special_tokens=False,
+                return_tensors='pt'
+            )
+            past = None
+        next_input = input_ids if past is None else input_ids[:, -1:]
+        boundary = SentenceBoundary(tokenizer, input_ids.shape[-1])
+
+        emitted = ""
+        while input_ids.shape[-1] < max_length:
+            outputs = model(next_input, past_key_values=past, use_cache=True)
+            past = outputs.past_key_values
+            scores = outputs.logits[:, -1, :].float()
+            done = boundary.is_done(input_ids[0])
+            if not done and eos_token_id is not None:
+                scores[:, eos_token_id] = -float("inf")
+            scores = warpers(input_ids, processors(input_ids, scores))
+            next_token = torch.multinomial(
+                torch.softmax(scores, dim=-1),
+                num_samples=1
+            )
+            if done and next_token.item() == eos_token_id:
+                break
+            input_ids = torch.cat([input_ids, next_token], dim=-1)
+            next_input = next_token
+
+            text = tokenizer.decode(
+                input_ids[0],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=True
+            )
+            # A Cyrillic letter may span two byte-level tokens.
+            if text.endswith("�") or not text.startswith(emitted):
+                continue
+            if len(text) > len(emitted):
+                yield text[len(emitted):]
+                emitted = text
+            if boundary.is_done(input_ids[0]):
+                break
@@ -0,0 +1,135 @@
+"""Memory-mapped model weights.
+
+Converts a pretrained checkpoint once into a flat file that later loads
+zero-copy with mmap, so boot skips deserialization and every process
+mapping the file shares the same read-only page cache::
+
+    python -m inference.weights ./weights
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Tuple
+
+import torch
+from transformers import (
+    GPT2Config,
+    GPT2LMHeadModel,
+    GPT2Tokenizer
+)
+from transformers.modeling_utils import no_init_weights
+
+from inference.config import InferenceConfig
+
+WEIGHTS_FILE = "weights.bin"
+INDEX_FILE = "weights.json"
+ALIGNMENT = 64
+
+DTYPES: Dict[str, torch.dtype] = {
+    "float32": torch.float32,
+    "bfloat16": torch.bfloat16,
+    "float16": torch.float16,
+    "uint8": torch.uint8,
+    "bool": torch.bool,
+    "int64": torch.int64,
+}
+
+
+def convert_weights(
+    model_name: str,
+    path: Path,
+    dtype: torch.dtype = torch.float32,
+) -> None:
+    """Save model config, tokenizer and weights in mmap-able layout."""
+    path.mkdir(parents=True, exist_ok=True)
+    tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+    model = GPT2LMHeadModel.from_pretrained(model_name)
+    tokenizer.save_pretrained(path)
+    model.config.save_pretrained(path)
+
+    index: Dict[str, dict] = {}
+    offsets: Dict[Tuple[int, int], int] = {}
+    offset = 0
+    with (path / WEIGHTS_FILE).open("wb") as file:
+        for name, tensor in model.state_dict().items():
+            # Tied weights share storage, write them once.
+            key = (tensor.data_ptr(), tensor.numel())
+            if tensor.is_floating_point():
+                tensor = tensor.to(dtype)
+            tensor = tensor.contiguous()
+            if key not in offsets:
+                offset += -offset % ALIGNMENT
+                file.seek(offset)
+                data = tensor.view(-1).view(torch.uint8).numpy().tobytes()
+                file.write(data)
+                offsets[key] = offset
+                offset += len(data)
+            index[name] = {
+                "dtype": str(tensor.dtype).replace("torch.", ""),
+                "shape": list(tensor.shape),
+                "offset": offsets[key],
+            }
+    with (path / INDEX_FILE).open("w") as file:
+        json.dump(index, file)
+
+
+def load_mmap_model(path: Path) -> Tuple[GPT2LMHeadModel, GPT2Tokenizer]:
+    """Load model whose weights are views of the mmap'ed weights file."""
+    tokenizer = GPT2Tokenizer.from_pretrained(path)
+    config = GPT2Config.from_pretrained(path)
+    with no_init_weights():
+        model = GPT2LMHeadModel(config)
+
+    with (path / INDEX_FILE).open() as file:
+        index = json.load(file)
+    weights_path = path / WEIGHTS_FILE
+    # shared=False maps the file privately: pages stay shared between
+    # processes until someone writes to them.
+    buffer = torch.from_file(
+        str(weights_path),
+        shared=False,
+        size=weights_path.stat().st_size,
+        dtype=torch.uint8
+    )
+    for name, spec in index.items():
+        dtype = DTYPES[spec["dtype"]]
+        shape = spec["shape"]
+        numel = 1
+        for size in shape:
+            numel *= size
+        nbytes = numel * torch.tensor([], dtype=dtype).element_size()
+        tensor = buffer[spec["offset"]:spec["offset"] + nbytes]
+        tensor = tensor.view(dtype).view(shape)
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(
+                tensor,
+                requires_grad=False
+            )
+        else:
+            module._buffers[attr] = tensor
+    model.tie_weights()
+    return model, tokenizer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert model weights for mmap loading."
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument(
+        "--model-name",
+        default=InferenceConfig().model_name
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "bfloat16"],
+        default="float32"
+    )
+    args = parser.parse_args()
+    convert_weights(args.model_name, args.path, DTYPES[args.dtype])
+
+
+if __name__ == "__main__":
+    main()
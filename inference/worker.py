@@ -0,0 +1,106 @@
+"""Shared inference worker.
+
+Holds a single copy of the model and serves generate requests from
+HTTP workers over a local Unix socket, so HTTP workers can be scaled
+without multiplying model memory::
+
+    python -m inference.worker --address /tmp/gimmefy-inference.sock
+
+Start several workers on different addresses and list all of them in
+GIMMEFY_INFERENCE_WORKERS to spread requests over K model copies.
+"""
+import argparse
+import os
+import threading
+from logging import basicConfig, getLogger
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener
+from typing import Callable, List
+
+from config import InferenceParams
+from inference.config import InferenceConfig
+from inference.generate import WARMUP_PROMPT, generate_texts
+from inference.prompt_cache import PromptCache
+from inference.registry import get_model
+from inference.runtime import configure_runtime
+
+log = getLogger(__name__)
+
+GenerateFn = Callable[[List[str]], List[str]]
+
+
+def _handle(
+    conn: Connection,
+    generate: GenerateFn,
+    slots: threading.Semaphore
+) -> None:
+    """Answer requests of one HTTP worker connection."""
+    with conn:
+        while True:
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            if kind != "generate":
+                conn.send(("error", f"Unknown request {kind!r}"))
+                continue
+            try:
+                with slots:
+                    texts = generate(payload)
+            except Exception as detail:
+                log.exception("Generation failed")
+                conn.send(("error", repr(detail)))
+                continue
+            conn.send(("ok", texts))
+
+
+def serve(address: str, config: InferenceConfig, authkey: bytes) -> None:
+    """Load the model and serve generate requests forever."""
+    if not authkey:
+        raise ValueError("Worker authkey is required")
+    configure_runtime(config)
+    model, tokenizer = get_model(config)
+    prompt_cache = PromptCache(max_size=config.prompt_cache_size)
+
+    def generate(queries: List[str]) -> List[str]:
+        return generate_texts(model, tokenizer, queries, prompt_cache)
+
+    generate([WARMUP_PROMPT])
+    slots = threading.Semaphore(config.slots)
+
+    if os.path.exists(address):
+        os.unlink(address)
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        log.info(f"Inference worker {os.getpid()} listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as detail:
+                log.warning(f"Rejected connection: {detail!r}")
+                continue
+            threading.Thread(
+                target=_handle,
+                args=(conn, generate, slots),
+                daemon=True
+            ).start()
+
+
+def main() -> None:
+    config = InferenceParams()
+    parser = argparse.ArgumentParser(
+        description="Serve model inference over a Unix socket."
+    )
+    parser.add_argument(
+        "--address",
+        default=config.worker_addresses.split(",")[0]
+        or "/tmp/gimmefy-inference.sock"
+    )
+    args = parser.parse_args()
+    if not config.worker_authkey:
+        parser.error("set GIMMEFY_INFERENCE_AUTHKEY")
+    basicConfig(level="INFO")
+    serve(args.address, config, config.worker_authkey.encode())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import enum
+from typing import List
+
 from sqlmodel import SQLModel
 
 
@@ -12,6 +14,9 @@ class ObjsEnum(enum.Enum):
 class ObjBase(SQLModel):
 
     __colname__: str = 'non_set'
+    __indexes__: List[dict] = [
+        {"keys": "id", "unique": True},
+    ]
 
     id: str
     description: str
@@ -1,9 +1,15 @@
+from typing import List
+
 from sqlmodel import SQLModel
 
 
 class RuleLevel(SQLModel):
 
     __colname__: str = 'rule_levels'
+    __indexes__: List[dict] = [
+        {"keys": "level", "unique": True},
+        {"keys": "exp_gte"},
+    ]
 
     level: int
     exp_gte: int
@@ -12,6 +18,10 @@ class RuleLevel(SQLModel):
 class RuleItem(SQLModel):
 
     __colname__: str = 'rule_items'
+    __indexes__: List[dict] = [
+        {"keys": "level", "unique": True},
+        {"keys": "exp_gte"},
+    ]
 
     item: str
     level: int
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
-from typing import List
+from typing import Any, Dict, List, Set
 
+from pydantic import PrivateAttr
 from sqlmodel import SQLModel, Field
 
 from models.objects import ObjTable, ObjChair, ObjMisc
@@ -22,6 +23,9 @@ class User(SQLModel):
     """User."""
 
     __colname__: str = "users"  # type: ignore
+    __indexes__: List[dict] = [
+        {"keys": "username", "unique": True},
+    ]
 
     username: str
     gender: str = "male"
@@ -56,6 +60,51 @@ class User(SQLModel):
     owned_chairs: List[str] = Field(default_factory=lambda: ["default"])
     owned_misc: List[str] = Field(default_factory=list)
 
+    # Changes since load, see get_update.
+    _changed: Set[str] = PrivateAttr(default_factory=set)
+    _inc: Dict[str, float] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        # SQLModel does not set up private attributes itself.
+        self._init_private_attributes()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        changed = getattr(self, "_changed", None)
+        if (
+            changed is not None
+            and name in self.__fields__
+            and self.__dict__.get(name) != value
+        ):
+            changed.add(name)
+            self._inc.pop(name, None)
+        super().__setattr__(name, value)
+
+    def inc(self, name: str, value: float) -> None:
+        """Add value to a counter, saved with $inc."""
+        if not value:
+            return
+        super().__setattr__(name, getattr(self, name) + value)
+        if name not in self._changed:
+            self._inc[name] = self._inc.get(name, 0) + value
+
+    def get_update(self) -> Dict[str, Any]:
+        """Mongo update of the fields changed since load.
+
+        Lists changed in place are not seen, assign them instead.
+        """
+        update: Dict[str, Any] = {}
+        if self._changed:
+            update["$set"] = self.dict(include=self._changed)
+        if self._inc:
+            update["$inc"] = dict(self._inc)
+        return update
+
+    def clear_changes(self) -> None:
+        """Mark the user as saved."""
+        self._changed.clear()
+        self._inc.clear()
+
     @classmethod
     def create_new(
         cls,
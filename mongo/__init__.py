@@ -1,7 +1,11 @@
 """Mongo client."""
 
 # flake8: noqa
-from mongo.db import MongoDBConfig, get_mongo_client
+from mongo.db import MongoDBConfig, get_mongo_client, get_async_mongo_client
 from pymongo.database import Database
 from pymongo.collection import Collection
+from motor.motor_asyncio import (
+    AsyncIOMotorDatabase as AsyncDatabase,
+    AsyncIOMotorCollection as AsyncCollection
+)
 from bson import ObjectId
@@ -1,5 +1,6 @@
 """Mongo db."""
 import pytz
+from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 from pymongo import MongoClient
 
@@ -14,17 +15,33 @@ class MongoDBConfig(BaseModel):
     db: str
 
 
-def get_mongo_client(mongodb_config: MongoDBConfig) -> MongoClient:
-    """Return mongodb connection."""
-    url = "mongodb://{username}:{password}@{host}:{port}".format(
+def _mongo_url(mongodb_config: MongoDBConfig) -> str:
+    return "mongodb://{username}:{password}@{host}:{port}".format(
         username=mongodb_config.username,
         password=mongodb_config.password,
         host=mongodb_config.host,
         port=mongodb_config.port,
     )
+
+
+def get_mongo_client(mongodb_config: MongoDBConfig) -> MongoClient:
+    """Return mongodb connection."""
+    url = _mongo_url(mongodb_config)
     client: MongoClient = MongoClient(
         host=url,
         tz_aware=True,
         tzinfo=pytz.utc
     )
     return client
+
+
+def get_async_mongo_client(
+    mongodb_config: MongoDBConfig
+) -> AsyncIOMotorClient:
+    """Return asyncio mongodb connection."""
+    client: AsyncIOMotorClient = AsyncIOMotorClient(
+        host=_mongo_url(mongodb_config),
+        tz_aware=True,
+        tzinfo=pytz.utc
+    )
+    return client
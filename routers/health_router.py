@@ -0,0 +1,34 @@
+from typing import Dict
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from helpers.metrics import get_counters
+from routers.user_router import server as user_server
+
+router = APIRouter(
+    tags=["health"],
+)
+
+
+@router.get(
+    "/zpg/metrics",
+    summary="Получить счетчики воркера",
+    response_model=Dict[str, int],
+)
+async def get_metrics() -> Dict[str, int]:
+    """Получить счетчики воркера."""
+    return get_counters()
+
+
+@router.get(
+    "/zpg/ready",
+    summary="Проверить готовность воркера",
+    response_class=JSONResponse,
+)
+async def get_ready() -> JSONResponse:
+    """Проверить готовность воркера."""
+    return JSONResponse(
+        {"ready": user_server.ready},
+        status_code=200 if user_server.ready else 503
+    )
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import Response
 
 from config import GimmefyServerConfig
 from models.store import StoreUpdateResult, Store
@@ -20,10 +23,15 @@ router = APIRouter(
     response_model=Store,
 )
 async def get_store(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
     admin: AdminUser = Depends(server.admin_auth)
-) -> Store:
+) -> Response:
     """Получить данные объектов."""
-    return await server.get_store()
+    return await server.get_store_response(
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding
+    )
 
 
 @router.post(
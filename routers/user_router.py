@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import RedirectResponse, StreamingResponse
 
 from config import GimmefyServerConfig
 from models.users import User, UserFilled, UserTip
@@ -106,13 +106,15 @@ async def purchase_table(
     username: str,
     table_id: str,
     select_after_purchase: bool = True,
+    idempotency_key: Optional[str] = Header(None),
     admin: AdminUser = Depends(server.admin_auth),
 ) -> User:
     """Купить стол."""
     return await server.purchase_table(
         username,
         table_id,
-        select_after_purchase
+        select_after_purchase,
+        idempotency_key
     )
 
 
@@ -125,13 +127,15 @@ async def purchase_chair(
     username: str,
     chair_id: str,
     select_after_purchase: bool = True,
+    idempotency_key: Optional[str] = Header(None),
     admin: AdminUser = Depends(server.admin_auth),
 ) -> User:
     """Купить стул."""
     return await server.purchase_chair(
         username,
         chair_id,
-        select_after_purchase
+        select_after_purchase,
+        idempotency_key
     )
 
 
@@ -144,13 +148,15 @@ async def purchase_misc(
     username: str,
     misc_id: str,
     select_after_purchase: bool = True,
+    idempotency_key: Optional[str] = Header(None),
     admin: AdminUser = Depends(server.admin_auth),
 ) -> User:
     """Купить прочие предметы."""
     return await server.purchase_misc(
         username,
         misc_id,
-        select_after_purchase
+        select_after_purchase,
+        idempotency_key
     )
 
 
@@ -250,6 +256,30 @@ async def get_tip(
     )
 
 
+@router.get(
+    "/zpg/user/{username}/tip/stream",
+    summary="Получить совет потоком событий",
+    response_class=StreamingResponse,
+)
+async def get_tip_stream(
+    username: str,
+    expavg_score: float,
+    cpus: int,
+    registration_time: datetime,
+    total_score: float = 0.0,
+    has_android: bool = False
+) -> StreamingResponse:
+    """Получить совет потоком событий."""
+    return await server.get_tip_stream(
+        username=username,
+        expavg_score=expavg_score,
+        cpus=cpus,
+        registration_time=registration_time,
+        total_score=total_score,
+        has_android=has_android
+    )
+
+
 @router.get(
     "/zpg/user/{username}/level",
     summary="Получить уровень",
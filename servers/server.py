@@ -15,15 +15,10 @@ from sqlmodel import SQLModel
 import os
 import argparse
 import logging
-import numpy as np
-import torch
-from transformers import (
-    GPT2LMHeadModel,
-    GPT2Tokenizer)
 
 
 from config import GimmefyServerConfig
-from mongo import get_mongo_client, Database
+from mongo import get_async_mongo_client, AsyncDatabase
 
 security = HTTPBasic(auto_error=False)
 
@@ -36,16 +31,25 @@ class AdminUser(SQLModel):
 
 
 class Server:
-    """Generic server."""
+    """Generic server.
+
+    Servers are built when routers are imported, which with gunicorn
+    preload_app happens in the master. Mongo clients must not cross a
+    fork, so they are only made by ``connect`` in each worker's startup.
+    """
+
+    db: AsyncDatabase
 
     def __init__(self, config: GimmefyServerConfig):
         """Initialize the server."""
         self.log: Logger = getLogger(self.__class__.__name__)
-
-        self.db: Database = get_mongo_client(config.mongo)[config.mongo.db]
         self.config: GimmefyServerConfig = config
 
-        self.model, self.tokenizer = self._load_model()
+    def connect(self) -> None:
+        """Create database clients of this process."""
+        self.db = get_async_mongo_client(
+            self.config.mongo
+        )[self.config.mongo.db]
 
     def _user_auth_basic(
         self,
@@ -78,18 +82,3 @@ class Server:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication not provided",
         )
-
-    def _load_model(self):
-        device = torch.device("cpu")
-        model_class, tokenizer_class = (
-            GPT2LMHeadModel,
-            GPT2Tokenizer
-        )
-        self.tokenizer = tokenizer_class.from_pretrained(
-            'sberbank-ai/rugpt3medium_based_on_gpt2'
-        )
-        self.model = model_class.from_pretrained(
-            'sberbank-ai/rugpt3medium_based_on_gpt2'
-        )
-        self.model.to(device)
-        return self.model, self.tokenizer
\ No newline at end of file
@@ -1,107 +1,146 @@
 """Service server."""
+import asyncio
 import json
+from typing import Optional
 
+from fastapi import status
+from fastapi.responses import Response
+
+from config import GimmefyServerConfig
+from mongo import Database, get_mongo_client
 from models.store import Store, StoreUpdateResult
 from models.objects import (
     ObjTable,
     ObjChair,
     ObjMisc,
 )
-from models.rules import RuleLevel
-from helpers.objects import (
-    upsert_obj,
-    get_objs,
-    delete_objs
-)
+from helpers.objects import sync_objs
+from helpers.recompute import recompute_users
 from helpers.rules import (
-    upsert_rule_level,
-    get_rule_levels,
-    delete_rule_levels,
-    upsert_rule_item,
-    get_rule_items,
-    delete_rule_items
+    RuleBook,
+    get_rule_book,
+    sync_rule_levels,
+    sync_rule_items
 )
+from helpers.store import (
+    StoreSnapshot,
+    accepts_gzip,
+    etag_matches,
+    get_store_snapshot
+)
+from helpers.versions import Versioned, bump_store_version
 from servers.server import Server
 
 
 class ServiceServer(Server):
     """Service server."""
 
-    async def get_store(
-        self
-    ) -> Store:
-        tables = get_objs(self.db, {}, ObjTable)
-        chairs = get_objs(self.db, {}, ObjChair)
-        misc = get_objs(self.db, {}, ObjMisc)
-        rule_levels = get_rule_levels(self.db, {})
-        rule_items = get_rule_items(self.db, {})
-        return Store(
-            rule_levels=rule_levels,
-            rule_items=rule_items,
-            tables=tables,
-            chairs=chairs,
-            misc=misc,
+    sync_db: Database
+
+    def __init__(self, config: GimmefyServerConfig):
+        """Initialize the server."""
+        super().__init__(config)
+        self.snapshot: Versioned[StoreSnapshot] = Versioned(
+            load=get_store_snapshot,
+            check_interval=config.store_check_interval,
+        )
+
+    def connect(self) -> None:
+        """Create database clients of this process."""
+        super().connect()
+        # Background jobs run in threads with the blocking driver.
+        self.sync_db = get_mongo_client(
+            self.config.mongo
+        )[self.config.mongo.db]
+
+    async def get_store_response(
+        self,
+        if_none_match: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> Response:
+        """Serve the cached store snapshot."""
+        snapshot = await self.snapshot.get(self.db)
+        gzipped = accepts_gzip(accept_encoding)
+        etag = snapshot.gzip_etag if gzipped else snapshot.etag
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(if_none_match, etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers=headers
+            )
+        body = snapshot.body
+        if gzipped:
+            body = snapshot.gzip_body
+            headers["Content-Encoding"] = "gzip"
+        return Response(
+            body,
+            media_type="application/json",
+            headers=headers
         )
 
     async def _update_store(
         self,
         store: Store
     ) -> StoreUpdateResult:
+        rules = await get_rule_book(self.db)
         modified_count = 0
         deleted_count = 0
-        ids = []
-        for table in store.tables:
-            ids.append(table.id)
-            modified_count += upsert_obj(self.db, table)
-        deleted_count += delete_objs(
-            db=self.db,
-            filter={"id": {"$nin": ids}},
-            type=ObjTable
-        )
+        for objs, type in (
+            (store.tables, ObjTable),
+            (store.chairs, ObjChair),
+            (store.misc, ObjMisc),
+        ):
+            modified, deleted = await sync_objs(self.db, objs, type)
+            modified_count += modified
+            deleted_count += deleted
 
-        ids = []
-        for chair in store.chairs:
-            ids.append(chair.id)
-            modified_count += upsert_obj(self.db, chair)
-        deleted_count += delete_objs(
-            db=self.db,
-            filter={"id": {"$nin": ids}},
-            type=ObjChair
+        modified, deleted = await sync_rule_levels(
+            self.db,
+            store.rule_levels
         )
+        modified_count += modified
+        deleted_count += deleted
 
-        ids = []
-        for misc in store.misc:
-            ids.append(misc.id)
-            modified_count += upsert_obj(self.db, misc)
-        deleted_count += delete_objs(
-            db=self.db,
-            filter={"id": {"$nin": ids}},
-            type=ObjMisc
+        modified, deleted = await sync_rule_items(
+            self.db,
+            store.rule_items
         )
+        modified_count += modified
+        deleted_count += deleted
 
-        levels = []
-        for rule_level in store.rule_levels:
-            levels.append(rule_level.level)
-            modified_count += upsert_rule_level(self.db, rule_level)
-        deleted_count += delete_rule_levels(
-            db=self.db,
-            filter={"level": {"$nin": levels}},
-        )
-
-        items = []
-        for rule_item in store.rule_items:
-            items.append(rule_item.level)
-            modified_count += upsert_rule_item(self.db, rule_item)
-        deleted_count += delete_rule_items(
-            db=self.db,
-            filter={"level": {"$nin": items}},
-        )
+        if modified_count or deleted_count:
+            await bump_store_version(self.db)
+            new_rules = await get_rule_book(self.db)
+            if new_rules != rules:
+                self._recompute_users(new_rules)
 
         return StoreUpdateResult(
             modified_count=modified_count,
             deleted_count=deleted_count
         )
 
+    def _recompute_users(self, rules: RuleBook) -> None:
+        """Bring stored user levels up to date in background."""
+        def done(future: asyncio.Future) -> None:
+            if future.exception() is not None:
+                self.log.error(
+                    "User levels recompute failed",
+                    exc_info=future.exception()
+                )
+                return
+            self.log.info(f"Recomputed levels of {future.result()} users")
+
+        asyncio.get_running_loop().run_in_executor(
+            None,
+            recompute_users,
+            self.sync_db,
+            rules
+        ).add_done_callback(done)
+
     async def update_store(
         self,
         store: Store
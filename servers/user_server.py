@@ -1,11 +1,33 @@
 """User server."""
+import json
+import time
 from datetime import datetime, timezone
-from typing import Type, overload
+from typing import (
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Type,
+    overload
+)
 
 from fastapi import status
-from fastapi.responses import Response, RedirectResponse
+from fastapi.responses import Response, RedirectResponse, StreamingResponse
 from fastapi.exceptions import HTTPException
-from helpers.tip_gen import calc_score, tip_gen
+from helpers.cache import TTLCache
+from helpers.tip_gen import calc_score, tip_gen, tip_stream, is_valid_tip
+from inference import (
+    BatchScheduler,
+    InferenceExecutor,
+    PromptCache,
+    RemoteGenerator,
+    TextPool,
+    WARMUP_PROMPT,
+    generate_texts,
+    get_model,
+    stream_text
+)
 
 from models.users import User, UserFilled, UserTip, dt2date
 from models.objects import (
@@ -18,42 +40,127 @@ from helpers.users import (
     get_user_by_username,
     fill_in_user,
     create_user,
-    update_user
-)
-from helpers.objects import (
-    get_obj_by_id
-)
-from helpers.rules import (
-    get_rule_level_by_exp,
-    get_rule_level_by_level,
-    get_rule_item_by_exp,
-    get_rule_item_by_level
+    update_user,
+    purchase_obj
 )
+from helpers.objects import ObjCatalog, get_obj_catalog
+from helpers.rules import LVL_MAP, RuleBook, get_rule_book
+from helpers.versions import Versioned
+from helpers.write_behind import UserWriteBuffer
+from config import GimmefyServerConfig
 from servers.server import Server
 
 
-LVL_MAP = {
-    1: {"level_name": "абитуриент", "year": ""},
-    2: {"level_name": "бакалавр", "year": "1 курс"},
-    3: {"level_name": "бакалавр", "year": "2 курс"},
-    4: {"level_name": "бакалавр", "year": "3 курс"},
-    5: {"level_name": "бакалавр", "year": "4 курс"},
-    6: {"level_name": "магистр", "year": "1 курс"},
-    7: {"level_name": "магистр", "year": "2 курс"},
-    8: {"level_name": "аспирант", "year": "1 курс"},
-    9: {"level_name": "аспирант", "year": "2 курс"},
-    10: {"level_name": "аспирант", "year": "3 курс"},
-    11: {"level_name": "аспирант", "year": "4 курс"},
-    12: {"level_name": "кандидат наук", "year": ""},
-    13: {"level_name": "доктор наук", "year": ""},
-    14: {"level_name": "доктор наук", "year": ""},
-    15: {"level_name": "доктор наук", "year": ""},
-}
-
-
 class UserServer(Server):
     """User server."""
 
+    def __init__(self, config: GimmefyServerConfig):
+        """Initialize the server."""
+        super().__init__(config)
+        self.executor = InferenceExecutor(
+            slots=config.inference.slots,
+            max_queue_depth=config.inference.max_queue_depth,
+        )
+        self.remote: Optional[RemoteGenerator] = None
+        if config.inference.worker_addresses:
+            self.remote = RemoteGenerator(
+                addresses=config.inference.worker_addresses.split(","),
+                authkey=config.inference.worker_authkey.encode(),
+            )
+        self.prompt_cache = PromptCache(
+            max_size=config.inference.prompt_cache_size
+        )
+        self.scheduler = BatchScheduler(
+            generate=self._generate_texts,
+            max_batch_size=config.inference.batch_max_size,
+            batch_window=config.inference.batch_window_ms / 1000,
+        )
+        self.ready = not config.inference.warmup
+        self.tip_cache: TTLCache[UserTip] = TTLCache(
+            max_size=config.tip_cache_size,
+            ttl=config.tip_cache_ttl,
+            daily=True,
+        )
+        self.pool = TextPool(
+            generate=self._generate_texts,
+            is_valid=is_valid_tip,
+            is_idle=lambda: self.executor.is_idle,
+            low_watermark=config.inference.pool_low_watermark,
+            high_watermark=config.inference.pool_high_watermark,
+            max_prompts=config.inference.pool_max_prompts,
+            batch_size=config.inference.batch_max_size,
+            interval=config.inference.pool_interval_ms / 1000,
+        )
+        self.rules: Versioned[RuleBook] = Versioned(
+            load=get_rule_book,
+            check_interval=config.store_check_interval,
+        )
+        self.catalog: Versioned[ObjCatalog] = Versioned(
+            load=get_obj_catalog,
+            check_interval=config.store_check_interval,
+        )
+        self.writes: Optional[UserWriteBuffer] = None
+
+    def connect(self) -> None:
+        """Create database clients and the write buffer of this process."""
+        super().connect()
+        if self.config.write_behind:
+            self.writes = UserWriteBuffer(
+                db=self.db,
+                max_pending=self.config.write_behind_max_pending,
+                interval=self.config.write_behind_interval_ms / 1000,
+            )
+
+    def _generate_texts_sync(self, queries: List[str]) -> List[str]:
+        """Generate texts for a batch of prompts with the shared model."""
+        if self.remote is not None:
+            return self.remote.generate(queries)
+        model, tokenizer = get_model(self.config.inference)
+        return generate_texts(
+            model,
+            tokenizer,
+            queries,
+            self.prompt_cache
+        )
+
+    async def _generate_texts(self, queries: List[str]) -> List[str]:
+        """Generate texts for a batch of prompts in the executor."""
+        return await self.executor.run(self._generate_texts_sync, queries)
+
+    def _stream_text_sync(self, query: str) -> Iterator[str]:
+        """Yield text pieces of a continuation of query."""
+        if self.remote is not None:
+            # Inference workers answer whole texts only.
+            yield from self.remote.generate([query])
+            return
+        model, tokenizer = get_model(self.config.inference)
+        yield from stream_text(model, tokenizer, query, self.prompt_cache)
+
+    def _stream_text(
+        self,
+        query: str,
+        expires: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Stream text pieces of a continuation of query from the executor."""
+        return self.executor.iterate(
+            self._stream_text_sync,
+            query,
+            expires=expires
+        )
+
+    async def warmup(self) -> None:
+        """Load the model and run one generation before serving tips."""
+        started = time.perf_counter()
+        try:
+            await self._generate_texts([WARMUP_PROMPT])
+        except Exception:
+            self.log.exception("Model warmup failed")
+            return
+        self.ready = True
+        self.log.info(
+            f"Model warmed up in {time.perf_counter() - started:.1f}s"
+        )
+
     async def _promote_user(
         self,
         user: User,
@@ -64,16 +171,17 @@ class UserServer(Server):
     ) -> User:
         """Give exp to user."""
         if exp_added:
-            user.total_exp += exp_added
+            user.inc("total_exp", exp_added)
         if total_exp:
             user.total_exp = max(user.total_exp, total_exp)
-        rule = get_rule_level_by_exp(self.db, user.total_exp)
+        rules = await self.rules.get(self.db)
+        rule = rules.levels.by_exp(user.total_exp)
         if rule is not None:
             if rule.level >= user.level:
                 user.level = rule.level
         _map = LVL_MAP[user.level]
 
-        next_lvl_rule = get_rule_level_by_level(self.db, user.level + 1)
+        next_lvl_rule = rules.levels.by_level(user.level + 1)
 
         if next_lvl_rule is None:
             user.until_next_level = 0
@@ -82,16 +190,13 @@ class UserServer(Server):
         user.level_name = _map["level_name"]
         user.year = _map["year"]
 
-        rule_item = get_rule_item_by_exp(self.db, user.total_exp)
+        rule_item = rules.items.by_exp(user.total_exp)
         if rule_item is None:
             return user
         if rule_item.level >= user.item_level:
             user.item_level = rule_item.level
 
-        next_lvl_rule_item = get_rule_item_by_level(
-            self.db,
-            user.item_level + 1
-        )
+        next_lvl_rule_item = rules.items.by_level(user.item_level + 1)
 
         if next_lvl_rule_item is None:
             user.until_next_item = 0
@@ -110,6 +215,7 @@ class UserServer(Server):
         if delta_days > 1:
             user.current_streak = 0
         if delta_days:
+            # Derived from last_online, so saved with $set like max_streak.
             user.current_streak += 1
         user.max_streak = max(user.current_streak, user.max_streak)
 
@@ -121,7 +227,10 @@ class UserServer(Server):
 
         user.last_online = datetime.now(timezone.utc)
 
-        update_user(self.db, user)
+        if self.writes is not None:
+            self.writes.add(user)
+        else:
+            await update_user(self.db, user)
         return user
 
     async def _pay_user(
@@ -130,8 +239,20 @@ class UserServer(Server):
         money_added: int
     ) -> User:
         """Give money to user."""
-        user.total_money += money_added
-        update_user(self.db, user)
+        user.inc("total_money", money_added)
+        await update_user(self.db, user)
+        return user
+
+    async def _load_user(
+        self,
+        username: str
+    ) -> Optional[User]:
+        """Get a user with updates still waiting in the write buffer."""
+        if self.writes is not None:
+            await self.writes.settle(username)
+        user = await get_user_by_username(self.db, username)
+        if user is not None and self.writes is not None:
+            user = self.writes.overlay(user)
         return user
 
     async def create_user(
@@ -141,10 +262,7 @@ class UserServer(Server):
         default_money: int,
     ):
         """Create a new user."""
-        user = get_user_by_username(
-            self.db,
-            username
-        )
+        user = await self._load_user(username)
         if user is not None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
@@ -155,7 +273,7 @@ class UserServer(Server):
             default_exp=default_exp,
             default_money=default_money
         )
-        create_user(self.db, user)
+        await create_user(self.db, user)
         user = await self._promote_user(user, 0)
         user = await self._pay_user(user, 0)
         return user
@@ -166,10 +284,7 @@ class UserServer(Server):
         do_create: bool = False,
     ) -> User:
         """Get a user by username."""
-        user = get_user_by_username(
-            self.db,
-            username
-        )
+        user = await self._load_user(username)
         if user is None:
             if not do_create:
                 raise HTTPException(
@@ -190,7 +305,11 @@ class UserServer(Server):
         """Get a user by username and fill in owned objects."""
         user = await self.get_user(username)
         try:
-            user_filled = fill_in_user(self.db, user)
+            user_filled = await fill_in_user(
+                self.db,
+                user,
+                await self.catalog.get(self.db)
+            )
         except Exception as detail:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -245,7 +364,8 @@ class UserServer(Server):
         obj_id: str,
         type: Type[ObjBase]
     ):
-        obj = get_obj_by_id(self.db, obj_id, type)
+        catalog = await self.catalog.get(self.db)
+        obj = catalog.get(obj_id, type)
         if obj is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -253,80 +373,103 @@ class UserServer(Server):
             )
         return obj
 
-    async def purchase_table(
+    async def _purchase(
         self,
         username: str,
-        table_id: str,
-        select_after_purchase: bool
+        obj: ObjBase,
+        owned_field: str,
+        select: Dict[str, Dict[str, str]],
+        idempotency_key: Optional[str],
+        name: str,
     ) -> User:
+        """Buy obj with one conditional update, explain a refusal."""
+        user = await purchase_obj(
+            self.db,
+            username,
+            obj,
+            owned_field,
+            select,
+            idempotency_key
+        )
+        if user is not None:
+            if self.writes is not None:
+                user = self.writes.overlay(user)
+            return user
         user = await self.get_user(username)
-        table: ObjTable = await self.get_obj_by_id(table_id, ObjTable)
-        if table_id in user.owned_tables:
+        if obj.id in getattr(user, owned_field):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already ownes this table"
+                detail=f"User already ownes this {name}"
             )
-        if user.total_money < table.cost:
+        if user.total_money < obj.cost:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Not enough money"
             )
-        user.total_money -= table.cost
-        user.owned_tables.append(table_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User changed during purchase, try again"
+        )
+
+    async def purchase_table(
+        self,
+        username: str,
+        table_id: str,
+        select_after_purchase: bool,
+        idempotency_key: Optional[str] = None,
+    ) -> User:
+        table: ObjTable = await self.get_obj_by_id(table_id, ObjTable)
+        select: Dict[str, Dict[str, str]] = {}
         if select_after_purchase:
-            user.table = table_id
-        update_user(self.db, user)
-        return user
+            select = {"$set": {"table": table_id}}
+        return await self._purchase(
+            username,
+            table,
+            "owned_tables",
+            select,
+            idempotency_key,
+            "table"
+        )
 
     async def purchase_chair(
         self,
         username: str,
         chair_id: str,
-        select_after_purchase: bool
+        select_after_purchase: bool,
+        idempotency_key: Optional[str] = None,
     ) -> User:
-        user = await self.get_user(username)
         chair: ObjChair = await self.get_obj_by_id(chair_id, ObjChair)
-        if chair_id in user.owned_chairs:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already ownes this chair"
-            )
-        if user.total_money < chair.cost:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Not enough money"
-            )
-        user.total_money -= chair.cost
-        user.owned_chairs.append(chair_id)
+        select: Dict[str, Dict[str, str]] = {}
         if select_after_purchase:
-            user.chair = chair_id
-        update_user(self.db, user)
-        return user
+            select = {"$set": {"chair": chair_id}}
+        return await self._purchase(
+            username,
+            chair,
+            "owned_chairs",
+            select,
+            idempotency_key,
+            "chair"
+        )
 
     async def purchase_misc(
         self,
         username: str,
         misc_id: str,
-        select_after_purchase: bool
+        select_after_purchase: bool,
+        idempotency_key: Optional[str] = None,
     ) -> User:
-        user = await self.get_user(username)
         misc: ObjMisc = await self.get_obj_by_id(misc_id, ObjMisc)
-        if misc_id in user.owned_misc:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already ownes this misc"
-            )
-        if user.total_money < misc.cost:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Not enough money"
-            )
-        user.total_money -= misc.cost
-        user.owned_misc.append(misc_id)
+        select: Dict[str, Dict[str, str]] = {}
         if select_after_purchase:
-            user.misc.append(misc_id)
-        update_user(self.db, user)
-        return user
+            select = {"$addToSet": {"misc": misc_id}}
+        return await self._purchase(
+            username,
+            misc,
+            "owned_misc",
+            select,
+            idempotency_key,
+            "misc"
+        )
 
     async def switch_gender(
         self,
@@ -341,7 +484,7 @@ class UserServer(Server):
             user.gender = 'female'
         else:
             user.gender = 'male'
-        update_user(self.db, user)
+        await update_user(self.db, user)
         return Response()
 
     async def switch_theme(
@@ -357,7 +500,7 @@ class UserServer(Server):
             user.theme = 'dark'
         else:
             user.theme = 'light'
-        update_user(self.db, user)
+        await update_user(self.db, user)
         return Response()
 
     async def get_avatar(
@@ -458,12 +601,77 @@ class UserServer(Server):
             total_hosts=cpus
         )
 
-        return tip_gen(
+        deadline = None
+        if self.config.tip_deadline_ms:
+            deadline = self.config.tip_deadline_ms / 1000
+        return await tip_gen(
             self.db,
             user,
             expavg_score,
-            self.model,
-            self.tokenizer,
+            self.scheduler,
+            self.pool,
+            self.config.tip_max_retries,
+            deadline,
+            self.executor.estimated_wait,
+            self.tip_cache,
+        )
+
+    async def get_tip_stream(
+        self,
+        username: str,
+        total_score: float,
+        expavg_score: float,
+        cpus: int,
+        registration_time: datetime,
+        has_android: bool
+    ) -> StreamingResponse:
+        """Get tip as server-sent events."""
+        user = await self.get_user(
+            username,
+            do_create=True
+        )
+
+        total_score = calc_score(
+            total_score,
+            expavg_score,
+            cpus,
+            registration_time,
+        )
+        user = await self._promote_user(
+            user,
+            total_exp=total_score,
+            has_android=has_android,
+            total_hosts=cpus
+        )
+
+        deadline = None
+        if self.config.tip_deadline_ms:
+            deadline = self.config.tip_deadline_ms / 1000
+        events = tip_stream(
+            self.db,
+            user,
+            expavg_score,
+            self._stream_text,
+            self.pool,
+            deadline,
+            self.executor.estimated_wait,
+            self.tip_cache,
+        )
+
+        async def body() -> AsyncIterator[str]:
+            async for event, data in events:
+                yield (
+                    f"event: {event}\n"
+                    f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                )
+
+        return StreamingResponse(
+            body(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            }
         )
 
     async def get_level(
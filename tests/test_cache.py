@@ -0,0 +1,56 @@
+import time
+
+from helpers import cache
+from helpers.cache import TTLCache
+
+DAY = 24 * 3600
+# 2026-10-18 23:59:00 UTC
+LATE_EVENING = 1792367940.0
+
+
+def _clock(monkeypatch, now: float) -> list:
+    clock = [now]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+    monkeypatch.setattr(
+        cache,
+        "_next_midnight",
+        lambda: (clock[0] // DAY + 1) * DAY
+    )
+    return clock
+
+
+def test_next_midnight_is_next_utc_day_start():
+    midnight = cache._next_midnight()
+    assert midnight % DAY == 0
+    assert 0 < midnight - time.time() <= DAY
+
+
+def test_daily_entries_expire_at_midnight(monkeypatch):
+    clock = _clock(monkeypatch, LATE_EVENING)
+    tips: TTLCache[str] = TTLCache(max_size=10, ttl=3600, daily=True)
+    tips.set("bob", "tip")
+    clock[0] += 59
+    assert tips.get("bob") == "tip"
+    clock[0] += 1
+    assert tips.get("bob") is None
+
+
+def test_ttl_applies_without_daily(monkeypatch):
+    clock = _clock(monkeypatch, LATE_EVENING)
+    tips: TTLCache[str] = TTLCache(max_size=10, ttl=3600)
+    tips.set("bob", "tip")
+    clock[0] += 3599
+    assert tips.get("bob") == "tip"
+    clock[0] += 1
+    assert tips.get("bob") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    tips: TTLCache[str] = TTLCache(max_size=2, ttl=3600)
+    tips.set("a", "1")
+    tips.set("b", "2")
+    tips.get("a")
+    tips.set("c", "3")
+    assert tips.get("b") is None
+    assert tips.get("a") == "1"
+    assert tips.get("c") == "3"
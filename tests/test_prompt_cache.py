@@ -0,0 +1,93 @@
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from inference.prompt_cache import CachedPrompt, stack_prompts
+
+PAD = 0
+MAX_LENGTH = 12
+
+
+def _model() -> GPT2LMHeadModel:
+    torch.manual_seed(0)
+    config = GPT2Config(
+        vocab_size=50,
+        n_positions=64,
+        n_embd=32,
+        n_layer=2,
+        n_head=4,
+        initializer_range=0.5,
+    )
+    return GPT2LMHeadModel(config).eval()
+
+
+def _cached(model: GPT2LMHeadModel, ids: list) -> CachedPrompt:
+    input_ids = torch.tensor([ids])
+    if len(ids) < 2:
+        return CachedPrompt(input_ids, None)
+    with torch.inference_mode():
+        outputs = model(input_ids[:, :-1], use_cache=True)
+    return CachedPrompt(input_ids, outputs.past_key_values)
+
+
+def _scores(model: GPT2LMHeadModel, **kwargs) -> list:
+    with torch.inference_mode():
+        output = model.generate(
+            pad_token_id=PAD,
+            do_sample=False,
+            output_scores=True,
+            return_dict_in_generate=True,
+            **kwargs
+        )
+    return list(output.scores)
+
+
+def test_stacked_prompts_match_unpadded_generation():
+    model = _model()
+    rows = [[5, 6, 7, 8, 9], [3], [10, 11, 12], [5, 6, 7, 8, 9]]
+    input_ids, attention_mask, past = stack_prompts(
+        [_cached(model, row) for row in rows],
+        PAD
+    )
+    assert input_ids.shape == (4, 5)
+    assert attention_mask[1].tolist() == [0, 0, 0, 0, 1]
+    batched = _scores(
+        model,
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        past=past,
+        max_length=MAX_LENGTH,
+    )
+    for index, row in enumerate(rows):
+        single = _scores(
+            model,
+            input_ids=torch.tensor([row]),
+            max_length=MAX_LENGTH - input_ids.shape[-1] + len(row),
+        )
+        assert len(single) == len(batched)
+        for step_batched, step_single in zip(batched, single):
+            assert torch.allclose(
+                step_batched[index],
+                step_single[0],
+                atol=1e-4
+            )
+
+
+def test_equal_prompts_are_expanded_not_padded():
+    model = _model()
+    prompt = _cached(model, [1, 2, 3])
+    input_ids, attention_mask, past = stack_prompts([prompt] * 3, PAD)
+    assert input_ids.tolist() == [[1, 2, 3]] * 3
+    assert bool(attention_mask.all())
+    assert past is not None
+    assert past[0][0].shape[0] == 3
+    assert past[0][0].data_ptr() == prompt.past[0][0].data_ptr()
+
+
+def test_single_token_prompts_have_no_past():
+    model = _model()
+    input_ids, attention_mask, past = stack_prompts(
+        [_cached(model, [1]), _cached(model, [2])],
+        PAD
+    )
+    assert input_ids.tolist() == [[1], [2]]
+    assert past is None
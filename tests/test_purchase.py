@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from helpers.users import PURCHASE_KEYS_KEPT, create_user, purchase_obj
+from models.objects import ObjTable
+from models.users import User
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+TABLE = ObjTable(
+    id="oak",
+    description="Дубовый стол",
+    asset="assets/tables/table_2.svg",
+    cost=120,
+    min_level=1,
+)
+
+
+def _db(money: int = 200):
+    db = mongomock_motor.AsyncMongoMockClient()["gimmefy"]
+    user = User.create_new("bob", default_money=money)
+    asyncio.run(create_user(db, user))
+    return db
+
+
+def _buy(db, key=None, select=None):
+    return asyncio.run(purchase_obj(
+        db,
+        "bob",
+        TABLE,
+        "owned_tables",
+        select or {},
+        key
+    ))
+
+
+def _stored(db) -> dict:
+    return asyncio.run(db[User.__colname__].find_one({"username": "bob"}))
+
+
+def test_purchase_takes_money_and_adds_item():
+    db = _db()
+    user = _buy(db, select={"$set": {"table": "oak"}})
+    assert user.total_money == 80
+    assert user.owned_tables == ["default", "oak"]
+    assert user.table == "oak"
+    assert _stored(db)["total_money"] == 80
+
+
+def test_owned_item_is_not_bought_twice():
+    db = _db(money=1000)
+    assert _buy(db) is not None
+    assert _buy(db) is None
+    assert _stored(db)["total_money"] == 880
+
+
+def test_purchase_needs_enough_money():
+    db = _db(money=119)
+    assert _buy(db) is None
+    assert _stored(db)["total_money"] == 119
+
+
+def test_unknown_user():
+    db = mongomock_motor.AsyncMongoMockClient()["gimmefy"]
+    assert _buy(db) is None
+
+
+def test_replayed_key_returns_user_without_charging_again():
+    db = _db(money=1000)
+    first = _buy(db, key="k1")
+    replay = _buy(db, key="k1")
+    assert replay is not None
+    assert replay.total_money == first.total_money == 880
+    assert _stored(db)["purchase_keys"] == ["k1"]
+
+
+def test_only_recent_keys_are_kept():
+    db = _db()
+    asyncio.run(db[User.__colname__].update_one(
+        {"username": "bob"},
+        {"$set": {
+            "purchase_keys": [str(key) for key in range(PURCHASE_KEYS_KEPT)]
+        }}
+    ))
+    _buy(db, key="new")
+    keys = _stored(db)["purchase_keys"]
+    assert len(keys) == PURCHASE_KEYS_KEPT
+    assert keys[-1] == "new"
+    assert keys[0] == "1"
@@ -0,0 +1,96 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from helpers.recompute import _chunk_updates, _ladder_steps
+from helpers.rules import RuleBook, RuleLadder
+from models.rules import RuleItem, RuleLevel
+from models.users import User
+from servers.user_server import UserServer
+
+RULES = RuleBook(
+    levels=RuleLadder([
+        RuleLevel(level=level, exp_gte=exp)
+        for level, exp in (
+            (2, 50), (3, 130), (4, 200), (5, 300), (6, 500), (7, 750),
+        )
+    ]),
+    items=RuleLadder([
+        RuleItem(item=item, level=level, exp_gte=exp)
+        for item, level, exp in (
+            ("Лупа", 2, 10), ("Колба", 3, 40), ("Колба", 4, 75),
+            ("Доска", 5, 150), ("Весы", 6, 250),
+        )
+    ]),
+)
+
+FIELDS = (
+    "level",
+    "level_name",
+    "year",
+    "until_next_level",
+    "item_level",
+    "next_item",
+    "until_next_item",
+)
+
+
+class _Holder:
+
+    async def get(self, db):
+        return RULES
+
+
+class _Writes:
+
+    def add(self, user):
+        pass
+
+
+def _promoted(user: User) -> User:
+    server = SimpleNamespace(rules=_Holder(), db=None, writes=_Writes())
+    return asyncio.run(UserServer._promote_user(server, user))
+
+
+def _recomputed(user: User) -> dict:
+    doc = {"_id": user.username, **user.dict(include=set(FIELDS))}
+    doc["total_exp"] = user.total_exp
+    updates = _chunk_updates(
+        [doc],
+        _ladder_steps(RULES.levels),
+        _ladder_steps(RULES.items)
+    )
+    for update in updates:
+        doc.update(update._doc["$set"])
+    return doc
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_climb_matches_promote_user(seed):
+    rng = random.Random(seed)
+    exps = [0, 10, 10.5, 50, 50.5, 130, 749, 750, 751, 10 ** 4]
+    exps += [rng.uniform(0, 1000) for _ in range(100)]
+    for exp in exps:
+        user = User.create_new("bob", default_exp=0)
+        user.total_exp = exp
+        user.level = rng.choice([1, 1, 3, 7])
+        user.item_level = rng.choice([1, 1, 4])
+        expected = _promoted(user.copy(deep=True))
+        doc = _recomputed(user)
+        for field in FIELDS:
+            assert doc[field] == pytest.approx(
+                getattr(expected, field)
+            ), (exp, field)
+
+
+def test_unchanged_users_are_not_written():
+    user = _promoted(User.create_new("bob", default_exp=300))
+    doc = {"_id": "bob", **user.dict(include=set(FIELDS))}
+    doc["total_exp"] = user.total_exp
+    assert _chunk_updates(
+        [doc],
+        _ladder_steps(RULES.levels),
+        _ladder_steps(RULES.items)
+    ) == []
@@ -0,0 +1,40 @@
+from helpers.rules import RuleLadder
+from models.rules import RuleItem, RuleLevel
+
+LEVELS = RuleLadder([
+    RuleLevel(level=3, exp_gte=130),
+    RuleLevel(level=2, exp_gte=50),
+    RuleLevel(level=4, exp_gte=200),
+])
+
+
+def test_rules_are_sorted_by_threshold():
+    assert LEVELS.thresholds == [50, 130, 200]
+
+
+def test_by_exp_takes_highest_threshold_strictly_below():
+    assert LEVELS.by_exp(0) is None
+    assert LEVELS.by_exp(50) is None
+    assert LEVELS.by_exp(50.5).level == 2
+    assert LEVELS.by_exp(130).level == 2
+    assert LEVELS.by_exp(131).level == 3
+    assert LEVELS.by_exp(10 ** 6).level == 4
+
+
+def test_by_level():
+    assert LEVELS.by_level(3).exp_gte == 130
+    assert LEVELS.by_level(5) is None
+
+
+def test_duplicate_item_names_keep_their_levels():
+    items = RuleLadder([
+        RuleItem(item="Колба", level=3, exp_gte=40),
+        RuleItem(item="Колба", level=4, exp_gte=75),
+    ])
+    assert items.by_exp(80).level == 4
+    assert items.by_level(3).exp_gte == 40
+
+
+def test_equal_ladders():
+    assert LEVELS == RuleLadder(list(reversed(LEVELS.rules)))
+    assert LEVELS != RuleLadder(LEVELS.rules[:2])
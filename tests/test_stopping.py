@@ -0,0 +1,64 @@
+import torch
+
+from inference.stopping import (
+    MinSentencesLogitsProcessor,
+    SentenceBoundary,
+    SentenceStoppingCriteria,
+    count_sentences
+)
+
+EOS = 0
+WORDS = ["<eos>", "Привет", "мир", "как", "дела", ".", "!", "ты"]
+
+
+class WordTokenizer:
+    """Tokenizer with one word per token id."""
+
+    def decode(self, ids, skip_special_tokens: bool = False) -> str:
+        return " ".join(
+            WORDS[int(id)]
+            for id in ids
+            if not (skip_special_tokens and int(id) == EOS)
+        )
+
+
+def _ids(*words: str) -> torch.Tensor:
+    return torch.tensor([WORDS.index(word) for word in words])
+
+
+def test_count_sentences_skips_short_and_unfinished():
+    assert count_sentences("Как дела у тебя. Ну") == 1
+    assert count_sentences("Да. Как дела у тебя!") == 1
+    assert count_sentences("Как дела у тебя") == 0
+    assert count_sentences("Раз два три. Четыре пять шесть?") == 2
+
+
+def test_boundary_ignores_prompt():
+    boundary = SentenceBoundary(WordTokenizer(), prompt_length=4)
+    prompt = ("Привет", "мир", "как", ".")
+    assert not boundary.is_done(_ids(*prompt))
+    assert not boundary.is_done(_ids(*prompt, "как", "дела", "ты"))
+    assert boundary.is_done(_ids(*prompt, "как", "дела", "ты", "."))
+
+
+def test_eos_is_forbidden_until_done():
+    boundary = SentenceBoundary(WordTokenizer(), prompt_length=1)
+    processor = MinSentencesLogitsProcessor(boundary, EOS)
+    input_ids = torch.stack([
+        _ids("Привет", "как", "дела", "ты", "!"),
+        _ids("Привет", "как", "дела", "ты", "ты"),
+    ])
+    scores = processor(input_ids, torch.zeros(2, len(WORDS)))
+    assert scores[0, EOS] == 0
+    assert scores[1, EOS] == -float("inf")
+
+
+def test_stops_when_every_row_is_done():
+    boundary = SentenceBoundary(WordTokenizer(), prompt_length=1)
+    criteria = SentenceStoppingCriteria(boundary)
+    done = _ids("Привет", "как", "дела", "ты", "!")
+    assert criteria(torch.stack([done, done]), torch.zeros(2, 1))
+    assert not criteria(
+        torch.stack([done, _ids("Привет", "как", "дела", "ты", "ты")]),
+        torch.zeros(2, 1)
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import gzip
+
+import pytest
+
+from helpers import store
+from helpers.store import accepts_gzip, etag_matches, get_store_snapshot
+from models.store import Store
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abc-gz"', False),
+    ('"ab"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("GZIP", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("br, *", True),
+    ("*;q=0, gzip", True),
+    ("gzip;q=0, *", False),
+    ("*;q=0", False),
+    ("br", False),
+    ("identity", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_snapshot_representations_have_distinct_etags(monkeypatch):
+    async def get_store(db):
+        return Store()
+
+    monkeypatch.setattr(store, "get_store", get_store)
+    snapshot = asyncio.run(get_store_snapshot(None))
+    assert gzip.decompress(snapshot.gzip_body) == snapshot.body
+    assert snapshot.etag != snapshot.gzip_etag
+    assert snapshot.gzip_etag == snapshot.etag[:-1] + '-gz"'
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from pymongo import DeleteMany, InsertOne, ReplaceOne
+
+from helpers.sync import sync_collection
+
+
+class FakeCollection:
+    """Collection keeping documents in a list and recording writes."""
+
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = [{"_id": index, **doc} for index, doc in enumerate(docs)]
+        self.requests: List[Any] = []
+        self.indexes: List[Any] = []
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+    def find(self, filter):
+        return self._iterate()
+
+    async def bulk_write(self, requests, ordered):
+        assert ordered
+        self.requests = requests
+        counts = {InsertOne: 0, ReplaceOne: 0, DeleteMany: 0}
+        for request in requests:
+            counts[type(request)] += 1
+        return SimpleNamespace(
+            inserted_count=counts[InsertOne],
+            modified_count=counts[ReplaceOne],
+            deleted_count=counts[DeleteMany],
+        )
+
+    async def create_index(self, keys, unique):
+        self.indexes.append((keys, unique))
+
+
+def _sync(collection: FakeCollection, docs: List[Dict[str, Any]]):
+    return asyncio.run(sync_collection(collection, "level", docs))
+
+
+def test_nothing_is_written_when_unchanged():
+    docs = [{"level": 2, "exp_gte": 50}, {"level": 3, "exp_gte": 130}]
+    collection = FakeCollection(docs)
+    assert _sync(collection, docs) == (0, 0)
+    assert collection.requests == []
+    assert collection.indexes == [([("level", 1)], True)]
+
+
+def test_changes_are_diffed_into_one_bulk_write():
+    collection = FakeCollection([
+        {"level": 2, "exp_gte": 50},
+        {"level": 3, "exp_gte": 130},
+        {"level": 3, "exp_gte": 130},
+        {"level": 9, "exp_gte": 999},
+    ])
+    result = _sync(collection, [
+        {"level": 2, "exp_gte": 50},
+        {"level": 3, "exp_gte": 140},
+        {"level": 4, "exp_gte": 200},
+    ])
+    requests = collection.requests
+    # Duplicates and dropped keys go first, so the unique index can hold.
+    assert requests[0] == DeleteMany({"_id": {"$in": [2, 3]}})
+    assert requests[1:] == [
+        ReplaceOne({"_id": 1}, {"level": 3, "exp_gte": 140}),
+        InsertOne({"level": 4, "exp_gte": 200}),
+    ]
+    assert result == (2, 1)
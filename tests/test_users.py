@@ -0,0 +1,72 @@
+from models.users import User
+
+
+def _loaded(**data) -> User:
+    user = User.create_new("bob", default_exp=10, default_money=100)
+    for name, value in data.items():
+        setattr(user, name, value)
+    user.clear_changes()
+    return user
+
+
+def test_fresh_user_has_no_update():
+    assert _loaded().get_update() == {}
+
+
+def test_assigning_same_value_is_not_a_change():
+    user = _loaded(theme="dark")
+    user.theme = "dark"
+    assert user.get_update() == {}
+
+
+def test_assigned_fields_are_set():
+    user = _loaded()
+    user.theme = "dark"
+    user.level = 3
+    assert user.get_update() == {"$set": {"theme": "dark", "level": 3}}
+
+
+def test_counters_are_incremented():
+    user = _loaded()
+    user.inc("total_money", 50)
+    user.inc("total_money", -20)
+    user.inc("total_exp", 0)
+    assert user.total_money == 130
+    assert user.get_update() == {"$inc": {"total_money": 30}}
+
+
+def test_set_after_inc_saves_the_final_value():
+    user = _loaded()
+    user.inc("total_exp", 5)
+    user.total_exp = max(user.total_exp, 40)
+    assert user.get_update() == {"$set": {"total_exp": 40}}
+
+
+def test_inc_after_set_stays_in_set():
+    user = _loaded()
+    user.total_money = 500
+    user.inc("total_money", 7)
+    assert user.total_money == 507
+    assert user.get_update() == {"$set": {"total_money": 507}}
+
+
+def test_streak_is_set_not_incremented():
+    user = _loaded(current_streak=2)
+    user.current_streak += 1
+    assert user.get_update() == {"$set": {"current_streak": 3}}
+
+
+def test_clear_changes():
+    user = _loaded()
+    user.inc("total_money", 1)
+    user.theme = "dark"
+    user.clear_changes()
+    assert user.get_update() == {}
+
+
+def test_copies_track_changes_separately():
+    user = _loaded()
+    other = User(**user.dict())
+    other.inc("total_money", 1)
+    assert user.get_update() == {}
+    assert other.get_update() == {"$inc": {"total_money": 1}}
@@ -0,0 +1,184 @@
+import asyncio
+import random
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from helpers.write_behind import UserWriteBuffer, apply_update, merge_updates
+from models.users import User
+
+
+def test_merge_set_then_inc_folds_into_set():
+    assert merge_updates(
+        {"$set": {"total_exp": 10}},
+        {"$inc": {"total_exp": 5, "total_money": 1}},
+    ) == {"$set": {"total_exp": 15}, "$inc": {"total_money": 1}}
+
+
+def test_merge_inc_then_set_drops_inc():
+    assert merge_updates(
+        {"$inc": {"total_exp": 5}},
+        {"$set": {"total_exp": 40}},
+    ) == {"$set": {"total_exp": 40}}
+
+
+def test_merge_does_not_change_arguments():
+    first = {"$inc": {"total_money": 1}}
+    merge_updates(first, {"$inc": {"total_money": 2}})
+    assert first == {"$inc": {"total_money": 1}}
+
+
+def test_merged_update_has_the_same_effect():
+    rng = random.Random(0)
+    for _ in range(200):
+        updates = []
+        for _ in range(rng.randint(1, 5)):
+            update: Dict[str, Dict[str, Any]] = {}
+            for name in rng.sample(["a", "b", "c"], rng.randint(1, 3)):
+                operator = rng.choice(["$set", "$inc"])
+                update.setdefault(operator, {})[name] = rng.randint(-5, 5)
+            updates.append(update)
+        data = {"a": 1, "b": 2}
+        expected = data
+        merged: Dict[str, Dict[str, Any]] = {}
+        for update in updates:
+            expected = apply_update(expected, update)
+            merged = merge_updates(merged, update)
+        assert apply_update(data, merged) == expected
+
+
+class FakeUsers:
+    """Users collection whose bulk_write applies updates in memory."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.writes: List[List[Any]] = []
+        self.error: Optional[BaseException] = None
+
+    async def bulk_write(self, requests, ordered):
+        self.writes.append(requests)
+        for request in requests:
+            username = request._filter["username"]
+            self.docs[username] = apply_update(
+                self.docs.get(username, {}),
+                request._doc
+            )
+        # Applied by the server, the reply is still on its way.
+        await asyncio.sleep(self.delay)
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        return SimpleNamespace(modified_count=len(requests))
+
+
+def _buffer(users: FakeUsers, interval: float = 60) -> UserWriteBuffer:
+    return UserWriteBuffer(
+        {User.__colname__: users},  # type: ignore
+        max_pending=100,
+        interval=interval,
+    )
+
+
+def _user(**changes) -> User:
+    user = User.create_new("bob", default_exp=0, default_money=0)
+    user.clear_changes()
+    for name, value in changes.items():
+        user.inc(name, value)
+    return user
+
+
+def test_updates_of_a_user_are_coalesced():
+    users = FakeUsers()
+    buffer = _buffer(users)
+
+    async def main():
+        for _ in range(3):
+            buffer.add(_user(total_money=10, total_exp=1))
+        return await buffer.flush()
+
+    assert asyncio.run(main()) == 1
+    assert len(users.writes) == 1
+    assert users.docs["bob"] == {"total_money": 30, "total_exp": 3}
+
+
+def test_overlay_shows_pending_updates():
+    buffer = _buffer(FakeUsers())
+    buffer.add(_user(total_money=10))
+    user = buffer.overlay(_user())
+    assert user.total_money == 10
+    assert user.get_update() == {}
+
+
+def test_failed_writes_are_retried_whole():
+    users = FakeUsers()
+    users.error = BulkWriteError({"writeErrors": [{"index": 0}]})
+    buffer = _buffer(users)
+
+    async def main():
+        buffer.add(_user(total_money=10))
+        with pytest.raises(BulkWriteError):
+            await buffer.flush()
+        users.docs.clear()
+        buffer.add(_user(total_money=1))
+        await buffer.flush()
+
+    asyncio.run(main())
+    assert users.docs["bob"] == {"total_money": 11}
+
+
+def test_unknown_outcome_does_not_count_money_twice():
+    users = FakeUsers()
+    users.error = AutoReconnect("connection lost")
+    buffer = _buffer(users)
+
+    async def main():
+        user = _user(total_money=10)
+        user.theme = "dark"
+        buffer.add(user)
+        with pytest.raises(AutoReconnect):
+            await buffer.flush()
+        await buffer.flush()
+
+    asyncio.run(main())
+    assert users.docs["bob"] == {"total_money": 10, "theme": "dark"}
+    assert users.writes[1][0]._doc == {"$set": {"theme": "dark"}}
+
+
+async def _in_flight(users: FakeUsers, buffer: UserWriteBuffer):
+    """Start buffer and return once its first flush is being written."""
+    buffer.start()
+    buffer.add(_user(total_money=5))
+    while not users.writes:
+        await asyncio.sleep(0.01)
+    assert buffer._flushing
+    buffer.add(_user(total_money=7))
+
+
+def test_settle_waits_for_a_running_flush():
+    users = FakeUsers(delay=0.1)
+    buffer = _buffer(users, interval=0.01)
+
+    async def main():
+        await _in_flight(users, buffer)
+        await buffer.settle("bob")
+        assert not buffer._flushing
+        assert users.docs["bob"] == {"total_money": 5}
+        await buffer.stop()
+
+    asyncio.run(main())
+
+
+def test_stop_finishes_a_running_flush_once():
+    users = FakeUsers(delay=0.1)
+    buffer = _buffer(users, interval=0.01)
+
+    async def main():
+        await _in_flight(users, buffer)
+        await buffer.stop()
+
+    asyncio.run(main())
+    assert users.docs["bob"] == {"total_money": 12}
+    assert sum(len(requests) for requests in users.writes) == 2